@@ -1,27 +1,57 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, send_from_directory
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 import os
 import tempfile
 import logging
 from pathlib import Path
 import json
 import time
+import shutil
+import hashlib
+import queue
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# msgspec decodes and validates the location field in one C-level pass
+try:
+    import msgspec
+    
+    class Location(msgspec.Struct):
+        lat: float
+        lng: float
+        address: str = ''
+    
+    _location_decoder = msgspec.json.Decoder(Location)
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# The log format doesn't use thread/process info or caller location,
+# so skip collecting them for every record
+logging.logThreads = False
+logging.logProcesses = False
+logging._srcfile = None
+
 # Try to import YOLO model, fallback to mock if not available
 try:
     from yolo_model import analyze_video_file, get_model
     YOLO_AVAILABLE = True
     logger.info("YOLO model module imported successfully")
 except ImportError as e:
-    logger.warning(f"YOLO model not available: {e}")
+    logger.warning("YOLO model not available: %s", e)
     logger.info("Running in mock mode for demonstration")
     YOLO_AVAILABLE = False
 except Exception as e:
-    logger.error(f"YOLO initialization failed: {e}")
+    logger.error("YOLO initialization failed: %s", e)
     logger.info("Running in mock mode for demonstration")
     YOLO_AVAILABLE = False
 
@@ -31,13 +61,190 @@ CORS(app)
 # Configuration
 UPLOAD_FOLDER = 'uploads/videos'
 MAX_FILE_SIZE = 500 * 1024 * 1024  # 500MB
-ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
+ALLOWED_EXTENSIONS = frozenset({'mp4', 'avi', 'mov', 'mkv', 'webm'})
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # 4MB copy buffer for large uploads
+UPLOAD_FD_POOL_SIZE = 4  # Pre-opened unnamed upload files, one per concurrent upload
+
+# Reject oversized uploads before the request body is spooled to disk
+app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
 # Ensure upload directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Linux fast path: uploads are written to unnamed O_TMPFILE files in
+# UPLOAD_FOLDER and linked to their final name only once complete. The pool
+# fills on first upload so preforked workers never share pooled files
+_upload_dir_fd = None
+if hasattr(os, 'O_TMPFILE') and os.path.isdir('/proc/self/fd'):
+    _upload_dir_fd = os.open(UPLOAD_FOLDER, os.O_RDONLY | os.O_DIRECTORY)
+_upload_fd_pool = queue.Queue(maxsize=UPLOAD_FD_POOL_SIZE)
+
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    dot = filename.rfind('.')
+    return dot >= 0 and filename[dot + 1:].lower() in ALLOWED_EXTENSIONS
+
+def parse_location(location_data):
+    """Decode and validate the location form field, returning None if invalid"""
+    if MSGSPEC_AVAILABLE:
+        try:
+            return msgspec.structs.asdict(_location_decoder.decode(location_data))
+        except msgspec.DecodeError:
+            return None
+    
+    try:
+        location = json.loads(location_data)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(location, dict):
+        return None
+    # Same rules and shape as the msgspec Location struct: numeric lat and
+    # lng (not bools), an optional string address, and no other keys
+    lat = location.get('lat')
+    lng = location.get('lng')
+    address = location.get('address', '')
+    for value in (lat, lng):
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return None
+    if not isinstance(address, str):
+        return None
+    return {'lat': float(lat), 'lng': float(lng), 'address': address}
+
+def dump_json(payload):
+    """Serialize payload to JSON bytes with orjson when available"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload).encode()
+
+def json_response(payload, status=200):
+    """Build a JSON response from a payload"""
+    return app.response_class(dump_json(payload), status=status, mimetype='application/json')
+
+# Serialized bodies for status endpoints that don't change while the process runs
+_STATUS_CACHE = {}
+
+def cached_json_response(key, build_payload, max_age=5):
+    """Serve a payload built once per process, with ETag revalidation"""
+    entry = _STATUS_CACHE.get(key)
+    if entry is None:
+        body = dump_json(build_payload())
+        etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+        entry = _STATUS_CACHE[key] = (etag, body)
+    
+    etag, body = entry
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.max_age = max_age
+    # Answers 304 Not Modified when If-None-Match matches
+    return response.make_conditional(request)
+
+def _upload_fileno(file):
+    """Return the OS file descriptor backing an upload, or None if it is in memory"""
+    try:
+        return file.stream.fileno()
+    except (AttributeError, OSError):
+        return None
+
+def _open_upload_tmpfile():
+    """Open an unnamed file in UPLOAD_FOLDER, or None if unsupported"""
+    if _upload_dir_fd is None:
+        return None
+    try:
+        return os.open(UPLOAD_FOLDER, os.O_TMPFILE | os.O_WRONLY, 0o644)
+    except OSError:
+        # Filesystem without O_TMPFILE support
+        return None
+
+def _refill_upload_fd_pool():
+    """Top the pre-opened upload file pool back up to its capacity"""
+    while not _upload_fd_pool.full():
+        fd = _open_upload_tmpfile()
+        if fd is None:
+            return
+        try:
+            _upload_fd_pool.put_nowait(fd)
+        except queue.Full:
+            os.close(fd)
+            return
+
+def _acquire_upload_fd():
+    """Take a pre-opened upload file from the pool, opening one if it is empty"""
+    try:
+        return _upload_fd_pool.get_nowait()
+    except queue.Empty:
+        return _open_upload_tmpfile()
+
+def _write_upload(out, file, src_fd, size_hint):
+    """Copy an upload into an open output file"""
+    # Reserve the full extent up front to avoid fragmentation on large videos
+    if size_hint and hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(out.fileno(), 0, size_hint)
+        except OSError:
+            pass
+    
+    copied = False
+    if src_fd is not None:
+        try:
+            offset = 0
+            while offset < size_hint:
+                sent = os.sendfile(out.fileno(), src_fd, offset, size_hint - offset)
+                if sent == 0:
+                    break
+                offset += sent
+            out.seek(offset)
+            copied = True
+        except OSError:
+            out.seek(0)
+    
+    if not copied:
+        file.stream.seek(0)
+        shutil.copyfileobj(file.stream, out, length=UPLOAD_CHUNK_SIZE)
+    
+    # The request's Content-Length is slightly larger than the file itself
+    out.truncate()
+    # The video is read straight back by the decoder - keep it in page cache
+    if hasattr(os, 'posix_fadvise'):
+        os.posix_fadvise(out.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+
+def save_upload(file, filepath, size_hint=None):
+    """Write an uploaded file to disk with as few userspace copies as possible
+    
+    Large uploads are spooled by Werkzeug to an anonymous temp file; those are
+    copied in-kernel with os.sendfile. In-memory uploads fall back to a
+    buffered copy with a large chunk size. On Linux the data goes into a
+    pre-opened O_TMPFILE that is linked into place once fully written, so a
+    partial upload never shows up in UPLOAD_FOLDER.
+    """
+    src_fd = _upload_fileno(file) if hasattr(os, 'sendfile') else None
+    if src_fd is not None:
+        size_hint = os.fstat(src_fd).st_size
+    
+    tmp_fd = None
+    if os.path.dirname(filepath) == UPLOAD_FOLDER:
+        tmp_fd = _acquire_upload_fd()
+    
+    if tmp_fd is None:
+        with open(filepath, 'wb', buffering=0) as out:
+            _write_upload(out, file, src_fd, size_hint)
+        return
+    
+    try:
+        with open(tmp_fd, 'wb', buffering=0, closefd=False) as out:
+            _write_upload(out, file, src_fd, size_hint)
+        
+        # Passing dst_dir_fd makes os.link use linkat(AT_SYMLINK_FOLLOW),
+        # which links the file behind the /proc fd rather than the symlink
+        name = os.path.basename(filepath)
+        link_args = (f'/proc/self/fd/{tmp_fd}', name)
+        try:
+            os.link(*link_args, dst_dir_fd=_upload_dir_fd, follow_symlinks=True)
+        except FileExistsError:
+            # Same-second upload of the same filename - replace it as before
+            os.unlink(name, dir_fd=_upload_dir_fd)
+            os.link(*link_args, dst_dir_fd=_upload_dir_fd, follow_symlinks=True)
+    finally:
+        os.close(tmp_fd)
+        _refill_upload_fd_pool()
 
 def mock_analyze_video(video_path, location):
     """Mock video analysis when YOLO is not available"""
@@ -74,35 +281,44 @@ def mock_analyze_video(video_path, location):
         'fps': 30
     }
 
+@app.errorhandler(413)
+def file_too_large(e):
+    """Return a JSON error when the upload exceeds MAX_FILE_SIZE"""
+    return json_response({'error': f'File too large. Maximum size is {MAX_FILE_SIZE // (1024 * 1024)}MB'}, 413)
+
+def build_health_info():
+    """Build the /api/health payload"""
+    if YOLO_AVAILABLE:
+        model = get_model()
+        device = model.device
+        model_loaded = True
+    else:
+        device = 'cpu (mock)'
+        model_loaded = False
+        
+    return {
+        'status': 'healthy',
+        'model': 'YOLOv8 Traffic Analysis' if YOLO_AVAILABLE else 'Mock Analysis Server',
+        'version': '2.0.0',
+        'device': device,
+        'model_loaded': model_loaded,
+        'yolo_available': YOLO_AVAILABLE,
+        'supported_formats': sorted(ALLOWED_EXTENSIONS),
+        'max_file_size_mb': MAX_FILE_SIZE // (1024 * 1024)
+    }
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     try:
-        if YOLO_AVAILABLE:
-            model = get_model()
-            device = model.device
-            model_loaded = True
-        else:
-            device = 'cpu (mock)'
-            model_loaded = False
-            
-        return jsonify({
-            'status': 'healthy',
-            'model': 'YOLOv8 Traffic Analysis' if YOLO_AVAILABLE else 'Mock Analysis Server',
-            'version': '2.0.0',
-            'device': device,
-            'model_loaded': model_loaded,
-            'yolo_available': YOLO_AVAILABLE,
-            'supported_formats': list(ALLOWED_EXTENSIONS),
-            'max_file_size_mb': MAX_FILE_SIZE // (1024 * 1024)
-        })
+        return cached_json_response('health', build_health_info)
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return jsonify({
+        logger.error("Health check failed: %s", e)
+        return json_response({
             'status': 'error',
             'yolo_available': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze_video():
@@ -110,145 +326,190 @@ def analyze_video():
     try:
         # Check if video file is present
         if 'video' not in request.files:
-            return jsonify({'error': 'No video file provided'}), 400
+            return json_response({'error': 'No video file provided'}, 400)
         
         file = request.files['video']
         if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+            return json_response({'error': 'No file selected'}, 400)
         
         if not allowed_file(file.filename):
-            return jsonify({'error': 'Invalid file format'}), 400
+            return json_response({'error': 'Invalid file format'}, 400)
         
         # Get location data
         location_data = request.form.get('location')
         if not location_data:
-            return jsonify({'error': 'Location data required'}), 400
+            return json_response({'error': 'Location data required'}, 400)
         
-        try:
-            location = json.loads(location_data)
-        except json.JSONDecodeError:
-            return jsonify({'error': 'Invalid location data format'}), 400
+        location = parse_location(location_data)
+        if location is None:
+            return json_response({'error': 'Invalid location data format'}, 400)
+        
+        now = time.time()
+        now_i = int(now)
         
         # Save uploaded file
-        filename = f"{int(time.time())}_{file.filename}"
+        filename = f"{now_i}_{file.filename}"
         filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        save_upload(file, filepath, request.content_length)
         
-        logger.info(f"Analyzing video: {filename}")
+        logger.info("Analyzing video: %s", filename)
         
         # Analyze video with YOLO model or mock
         if YOLO_AVAILABLE:
             try:
                 analysis_result = analyze_video_file(filepath)
-                logger.info(f"YOLO analysis successful: {len(analysis_result['incidents'])} incidents")
+                logger.info("YOLO analysis successful: %s incidents", len(analysis_result['incidents']))
             except Exception as e:
-                logger.error(f"YOLO analysis failed: {e}")
+                logger.error("YOLO analysis failed: %s", e)
                 analysis_result = mock_analyze_video(filepath, location)
         else:
             analysis_result = mock_analyze_video(filepath, location)
         
         # Convert YOLO results to expected format
-        incidents = []
-        for incident in analysis_result['incidents']:
-            incidents.append({
-                'id': f"yolo_{int(incident['timestamp'])}_{incident['type']}",
-                'type': incident['type'],
-                'location': location,
-                'severity': get_severity(incident['confidence'], incident['type']),
-                'description': incident['description'],
-                'timestamp': incident['timestamp'],
-                'status': 'active',
-                'detectedBy': 'ai',
-                'confidence': incident['confidence'],
-                'detectionBoxes': [{
-                    'x': incident['bbox'][0],
-                    'y': incident['bbox'][1], 
-                    'width': incident['bbox'][2] - incident['bbox'][0],
-                    'height': incident['bbox'][3] - incident['bbox'][1],
-                    'class': incident['type'],
-                    'confidence': incident['confidence']
-                }] if 'bbox' in incident else []
-            })
+        incidents = [format_incident(incident, location) for incident in analysis_result['incidents']]
         
         response = {
-            'videoId': str(int(time.time())),
+            'videoId': str(now_i),
             'filename': filename,
             'location': location,
             'incidents': incidents,
-            'detections': analysis_result.get('incidents', []),
+            'detections': analysis_result['incidents'],
             'processedFrames': analysis_result['processed_frames'],
             'totalFrames': analysis_result['total_frames'],
             'status': 'completed',
             'analysisTime': f"{analysis_result['processed_frames'] / analysis_result['fps']:.1f}s",
             'modelVersion': 'YOLOv8n-Traffic',
-            'timestamp': time.time(),
+            'timestamp': now,
             'fps': analysis_result['fps']
         }
         
-        logger.info(f"Analysis complete: {len(incidents)} incidents detected")
-        return jsonify(response)
+        logger.info("Analysis complete: %s incidents detected", len(incidents))
+        return json_response(response)
         
+    except HTTPException:
+        # Let Flask's error handlers answer, e.g. the JSON 413 for oversized uploads
+        raise
     except Exception as e:
-        logger.error(f"Analysis error: {e}")
-        return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
+        logger.error("Analysis error: %s", e)
+        return json_response({'error': f'Analysis failed: {str(e)}'}, 500)
+
+def build_model_info():
+    """Build the /api/model/info payload"""
+    if YOLO_AVAILABLE:
+        model = get_model()
+        device = model.device
+        confidence_threshold = model.confidence_threshold
+    else:
+        device = 'cpu (mock)'
+        confidence_threshold = 0.5
+        
+    return {
+        'model_type': 'YOLOv8' if YOLO_AVAILABLE else 'Mock',
+        'device': device,
+        'confidence_threshold': confidence_threshold,
+        'yolo_available': YOLO_AVAILABLE,
+        'supported_classes': list(range(20)) if YOLO_AVAILABLE else ['mock_classes'],
+        'incident_types': ['traffic_jam', 'car_accident', 'blocked_road', 'emergency_vehicle'],
+        'model_size': 'nano (fastest)' if YOLO_AVAILABLE else 'mock',
+        'inference_speed': 'Real-time capable' if YOLO_AVAILABLE else 'Mock speed'
+    }
 
 @app.route('/api/model/info', methods=['GET'])
 def model_info():
     """Get information about the loaded model"""
     try:
-        if YOLO_AVAILABLE:
-            model = get_model()
-            device = model.device
-            confidence_threshold = model.confidence_threshold
-        else:
-            device = 'cpu (mock)'
-            confidence_threshold = 0.5
-            
-        return jsonify({
-            'model_type': 'YOLOv8' if YOLO_AVAILABLE else 'Mock',
-            'device': device,
-            'confidence_threshold': confidence_threshold,
-            'yolo_available': YOLO_AVAILABLE,
-            'supported_classes': list(range(20)) if YOLO_AVAILABLE else ['mock_classes'],
-            'incident_types': ['traffic_jam', 'car_accident', 'blocked_road', 'emergency_vehicle'],
-            'model_size': 'nano (fastest)' if YOLO_AVAILABLE else 'mock',
-            'inference_speed': 'Real-time capable' if YOLO_AVAILABLE else 'Mock speed'
-        })
+        return cached_json_response('model_info', build_model_info)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 @app.route('/uploads/<filename>')
 def serve_video(filename):
     """Serve uploaded video files"""
     return send_from_directory(UPLOAD_FOLDER, filename)
 
+def format_incident(incident, location):
+    """Convert an analysis incident into the API response format"""
+    incident_type = incident['type']
+    confidence = incident['confidence']
+    bbox = incident.get('bbox')
+    
+    return {
+        'id': f"yolo_{int(incident['timestamp'])}_{incident_type}",
+        'type': incident_type,
+        'location': location,
+        'severity': get_severity(confidence, incident_type),
+        'description': incident['description'],
+        'timestamp': incident['timestamp'],
+        'status': 'active',
+        'detectedBy': 'ai',
+        'confidence': confidence,
+        'detectionBoxes': [{
+            'x': bbox[0],
+            'y': bbox[1],
+            'width': bbox[2] - bbox[0],
+            'height': bbox[3] - bbox[1],
+            'class': incident_type,
+            'confidence': confidence
+        }] if bbox is not None else []
+    }
+
+# Incident type -> (confidence threshold, severity above, severity at or below)
+SEVERITY_RULES = {
+    'car_accident': (0.8, 'critical', 'high'),
+    'emergency_vehicle': (0.8, 'critical', 'high'),
+    'blocked_road': (0.7, 'high', 'medium'),
+    'traffic_jam': (0.6, 'medium', 'low')
+}
+
 def get_severity(confidence, incident_type):
     """Determine incident severity based on confidence and type"""
-    if incident_type in ['car_accident', 'emergency_vehicle']:
-        return 'critical' if confidence > 0.8 else 'high'
-    elif incident_type == 'blocked_road':
-        return 'high' if confidence > 0.7 else 'medium'
-    elif incident_type == 'traffic_jam':
-        return 'medium' if confidence > 0.6 else 'low'
-    else:
+    rule = SEVERITY_RULES.get(incident_type)
+    if rule is None:
         return 'medium'
+    threshold, above, below = rule
+    return above if confidence > threshold else below
 
-if __name__ == '__main__':
-    logger.info("Starting YOLOv8 Traffic Analysis Server...")
-    
-    if YOLO_AVAILABLE:
-        logger.info("Loading YOLO model...")
-        try:
-            model = get_model()
-            logger.info(f"YOLO model loaded successfully on {model.device}")
-        except Exception as e:
-            logger.error(f"Failed to load YOLO model: {e}")
-            logger.info("Continuing in mock mode...")
-            YOLO_AVAILABLE = False
-    else:
+def load_model_on_startup():
+    """Load the YOLO model once per process so requests never pay the load cost"""
+    global YOLO_AVAILABLE
+    if not YOLO_AVAILABLE:
         logger.info("Running in mock mode - YOLO dependencies not available")
+        return
     
+    logger.info("Loading YOLO model...")
+    try:
+        model = get_model()
+        if model.model is None:
+            logger.info("YOLO model load on %s deferred to the workers", model.device)
+        else:
+            logger.info("YOLO model loaded successfully on %s", model.device)
+    except Exception as e:
+        logger.error("Failed to load YOLO model: %s", e)
+        logger.info("Continuing in mock mode...")
+        YOLO_AVAILABLE = False
+
+def warmup_model():
+    """Finish the deferred model load and warmup, e.g. from a gunicorn post_fork hook"""
+    global YOLO_AVAILABLE
+    if not YOLO_AVAILABLE:
+        return
+    try:
+        get_model().finish_loading()
+    except Exception as e:
+        logger.error("YOLO warmup failed: %s", e)
+        logger.info("Continuing in mock mode...")
+        YOLO_AVAILABLE = False
+
+# Pin the model at import time so WSGI workers (gunicorn) load it before serving.
+# Loading also warms the model up, except in a preloading gunicorn master
+# (DEFER_MODEL_WARMUP), where the warmup runs in each worker after fork
+load_model_on_startup()
+
+if __name__ == '__main__':
+    logger.info("Starting YOLOv8 Traffic Analysis Server...")
     logger.info("Server starting on http://localhost:5000")
     logger.info("Health check available at: http://localhost:5000/api/health")
+    logger.info("For production use: gunicorn -c gunicorn.conf.py flask_server:app")
     
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    # Development fallback - threaded so uploads don't block health checks
+    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
@@ -0,0 +1,57 @@
+"""
+Gunicorn configuration for the YOLOv8 Traffic Analysis Server
+
+Usage:
+    gunicorn -c gunicorn.conf.py flask_server:app
+"""
+
+import gc
+import os
+
+bind = '0.0.0.0:5000'
+
+# Import flask_server (and load the YOLO weights) once in the master before
+# forking, so workers share the model's memory pages copy-on-write
+preload_app = True
+
+# CUDA must not be initialized before fork. With this set, the master skips
+# the warmup and, on a GPU host, the TensorRT export and load; post_fork
+# finishes them in each worker. Build the engine ahead of time with
+# install_yolo.py so a worker's first boot isn't spent exporting it
+os.environ.setdefault('DEFER_MODEL_WARMUP', '1')
+# Let torch.cuda.is_available() probe through NVML instead of the CUDA runtime
+os.environ.setdefault('PYTORCH_NVML_BASED_CUDA_CHECK', '1')
+
+# One worker by default; raise GUNICORN_WORKERS for CPU inference. On a GPU
+# each worker builds its own CUDA copy of the model, so keep a single worker
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+
+# Threads let uploads and inference overlap across concurrent requests
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Large uploads (up to 500MB) plus inference can take a while
+timeout = 300
+
+
+def pre_fork(server, worker):
+    """Keep the preloaded model's objects out of the cyclic GC before forking
+    
+    A collection in a worker writes to every tracked object's header, which
+    would copy the shared pages holding the model into each worker.
+    """
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Size the worker's PyTorch thread pool and finish loading the model before serving"""
+    try:
+        import torch
+        # Split the cores between workers so their intra-op pools don't
+        # oversubscribe; server.cfg includes any -w / --workers override
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // server.cfg.workers))
+    except ImportError:
+        pass
+    
+    import flask_server
+    flask_server.warmup_model()
@@ -0,0 +1,25 @@
+"""
+Gunicorn configuration for the demo working_server
+
+Usage:
+    gunicorn -c gunicorn_working.conf.py working_server:app
+"""
+
+import multiprocessing
+import os
+
+bind = '0.0.0.0:5000'
+
+# The demo server is I/O bound (uploads, disk writes and the optional
+# ?demo=1 delay), so cooperative gevent workers handle many concurrent
+# requests each. The gevent worker monkey-patches the stdlib at startup,
+# which makes time.sleep and socket reads yield instead of blocking.
+# Chunked-upload finalize locks and merges files in gevent's threadpool,
+# since flock and sendfile would otherwise stall the whole worker.
+worker_class = 'gevent'
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_connections = 1000
+
+# Large uploads (up to 500MB) can take a while on slow links
+timeout = 300
+keepalive = 5
@@ -28,9 +28,10 @@ def main():
     print("=" * 60)
     
     # Install Flask
-    if not run_command(f"{sys.executable} -m pip install flask flask-cors", "Installing Flask"):
+    pip_install = f"{sys.executable} -m pip install --no-input --disable-pip-version-check --no-color"
+    if not run_command(f"{pip_install} flask flask-cors", "Installing Flask"):
         print("Trying alternative installation...")
-        run_command(f"{sys.executable} -m pip install --user flask flask-cors", "Installing Flask (user)")
+        run_command(f"{pip_install} --user flask flask-cors", "Installing Flask (user)")
     
     # Create uploads directory
     os.makedirs("uploads/videos", exist_ok=True)
@@ -42,15 +43,14 @@ def main():
     print("Press Ctrl+C to stop the server")
     print("=" * 60)
     
+    # Replace this process with the server - execv only returns on failure
+    server_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'working_server.py')
     try:
-        # Import and run the server
-        exec(open('working_server.py').read())
-    except KeyboardInterrupt:
-        print("\n🛑 Server stopped")
-    except Exception as e:
+        os.execv(sys.executable, [sys.executable, server_path])
+    except OSError as e:
         print(f"❌ Server error: {e}")
-        print("\nTrying direct execution...")
-        os.system(f"{sys.executable} working_server.py")
+        print(f"Start it manually with: {sys.executable} {server_path}")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
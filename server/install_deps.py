@@ -7,16 +7,31 @@ import subprocess
 import sys
 import os
 
+# Skip pip's per-invocation prompts and version check
+PIP_FLAGS = ["--no-input", "--disable-pip-version-check", "--no-color"]
+
 def install_package(package):
     """Install a single package"""
     try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", package])
+        subprocess.check_call([sys.executable, "-m", "pip", "install", *PIP_FLAGS, package])
         print(f"✅ {package} installed successfully")
         return True
     except subprocess.CalledProcessError as e:
         print(f"❌ Failed to install {package}: {e}")
         return False
 
+def install_packages(packages):
+    """Install all packages in one pip invocation, retrying one by one on failure"""
+    try:
+        print(f"Installing {', '.join(packages)}...")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", *PIP_FLAGS, *packages])
+        print("✅ All packages installed successfully")
+        return len(packages)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Batch install failed: {e}")
+        print("Retrying packages individually...")
+        return sum(install_package(package) for package in packages)
+
 def main():
     print("🚀 Installing essential server dependencies...")
     print("=" * 50)
@@ -27,10 +42,7 @@ def main():
         "flask-cors"
     ]
     
-    success_count = 0
-    for package in essential_packages:
-        if install_package(package):
-            success_count += 1
+    success_count = install_packages(essential_packages)
     
     print("=" * 50)
     if success_count == len(essential_packages):
@@ -7,17 +7,32 @@ import subprocess
 import sys
 import os
 
+# Skip pip's per-invocation prompts and version check
+PIP_FLAGS = ["--no-input", "--disable-pip-version-check", "--no-color"]
+
 def install_package(package):
     """Install a single package"""
     try:
         print(f"Installing {package}...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", package])
+        subprocess.check_call([sys.executable, "-m", "pip", "install", *PIP_FLAGS, package])
         print(f"✅ {package} installed successfully")
         return True
     except subprocess.CalledProcessError as e:
         print(f"❌ Failed to install {package}: {e}")
         return False
 
+def install_packages(packages):
+    """Install all packages in one pip invocation, retrying one by one on failure"""
+    try:
+        print(f"Installing {', '.join(packages)}...")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", *PIP_FLAGS, *packages])
+        print("✅ All packages installed successfully")
+        return len(packages)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Batch install failed: {e}")
+        print("Retrying packages individually...")
+        return sum(install_package(package) for package in packages)
+
 def check_gpu():
     """Check if CUDA is available"""
     try:
@@ -44,13 +59,11 @@ def main():
         "ultralytics",
         "numpy",
         "Pillow",
-        "PyYAML"
+        "PyYAML",
+        "onnxruntime"
     ]
     
-    success_count = 0
-    for package in packages:
-        if install_package(package):
-            success_count += 1
+    success_count = install_packages(packages)
     
     print("=" * 50)
     
@@ -58,7 +71,7 @@ def main():
         print("🎉 All YOLOv8 dependencies installed successfully!")
         
         # Check GPU availability
-        check_gpu()
+        has_gpu = check_gpu()
         
         # Download YOLOv8 model
         try:
@@ -74,6 +87,24 @@ def main():
             results = model(test_image, verbose=False)
             print("✅ Model test successful")
             
+            # Export to ONNX for the CPU inference path
+            print("\n⚙️  Exporting ONNX model...")
+            try:
+                model.export(format='onnx', dynamic=True, simplify=True)
+                print("✅ ONNX model saved to yolov8n.onnx")
+            except Exception as e:
+                print(f"⚠️  ONNX export failed: {e}")
+            
+            # Build a TensorRT FP16 engine for faster GPU inference
+            if has_gpu:
+                print("\n⚙️  Exporting TensorRT FP16 engine...")
+                try:
+                    model.export(format='engine', half=True, imgsz=640, dynamic=True, batch=16)
+                    print("✅ TensorRT engine saved to yolov8n.engine")
+                except Exception as e:
+                    print(f"⚠️  TensorRT export failed: {e}")
+                    print("The server will use the PyTorch model instead")
+            
         except Exception as e:
             print(f"⚠️  Model download/test failed: {e}")
             print("You can download it manually when first running the server")
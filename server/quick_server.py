@@ -14,25 +14,80 @@ from pathlib import Path
 
 PORT = 5000
 
+# Static responses are serialized once at startup instead of per request
+HEALTH_BODY = json.dumps({
+    'status': 'healthy',
+    'model': 'Quick Demo Server',
+    'version': '1.0.0',
+    'device': 'cpu (demo)',
+    'model_loaded': True,
+    'yolo_available': False,
+    'supported_formats': ['mp4', 'avi', 'mov'],
+    'max_file_size_mb': 500
+}).encode()
+
+# Mock analysis response - only the time-dependent fields are patched per request
+DEMO_LOCATION = {
+    'lat': 17.3850,
+    'lng': 78.4867,
+    'address': 'Hyderabad, India'
+}
+
+ANALYZE_TEMPLATE = json.dumps({
+    'videoId': '__NOW_INT__',
+    'filename': 'demo_video.mp4',
+    'location': DEMO_LOCATION,
+    'incidents': [
+        {
+            'id': 'demo___NOW_INT___traffic_jam',
+            'type': 'traffic_jam',
+            'location': DEMO_LOCATION,
+            'severity': 'medium',
+            'description': 'Heavy traffic detected with 12 vehicles',
+            'timestamp': '__NOW__',
+            'status': 'active',
+            'detectedBy': 'ai',
+            'confidence': 0.85,
+            'detectionBoxes': [{
+                'x': 100,
+                'y': 50,
+                'width': 200,
+                'height': 150,
+                'class': 'traffic_jam',
+                'confidence': 0.85
+            }]
+        }
+    ],
+    'detections': [],
+    'processedFrames': 100,
+    'totalFrames': 100,
+    'status': 'completed',
+    'analysisTime': '3.2s',
+    'modelVersion': 'Quick-Demo-v1.0',
+    'timestamp': '__NOW__',
+    'fps': 30,
+    'demo_mode': True
+})
+
+def build_analyze_body():
+    """Fill the current time into the prebuilt mock analysis response"""
+    now = time.time()
+    body = ANALYZE_TEMPLATE.replace('"__NOW__"', repr(now)).replace('__NOW_INT__', str(int(now)))
+    return body.encode()
+
 class QuickHandler(http.server.SimpleHTTPRequestHandler):
+    def send_json(self, body):
+        """Send a prebuilt JSON body with CORS headers"""
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
     def do_GET(self):
         if self.path == '/api/health':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            
-            response = {
-                'status': 'healthy',
-                'model': 'Quick Demo Server',
-                'version': '1.0.0',
-                'device': 'cpu (demo)',
-                'model_loaded': True,
-                'yolo_available': False,
-                'supported_formats': ['mp4', 'avi', 'mov'],
-                'max_file_size_mb': 500
-            }
-            self.wfile.write(json.dumps(response).encode())
+            self.send_json(HEALTH_BODY)
             return
         
         # Handle other GET requests normally
@@ -40,57 +95,7 @@ class QuickHandler(http.server.SimpleHTTPRequestHandler):
     
     def do_POST(self):
         if self.path == '/api/analyze':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            
-            # Mock analysis response
-            mock_response = {
-                'videoId': str(int(time.time())),
-                'filename': 'demo_video.mp4',
-                'location': {
-                    'lat': 17.3850,
-                    'lng': 78.4867,
-                    'address': 'Hyderabad, India'
-                },
-                'incidents': [
-                    {
-                        'id': f'demo_{int(time.time())}_traffic_jam',
-                        'type': 'traffic_jam',
-                        'location': {
-                            'lat': 17.3850,
-                            'lng': 78.4867,
-                            'address': 'Hyderabad, India'
-                        },
-                        'severity': 'medium',
-                        'description': 'Heavy traffic detected with 12 vehicles',
-                        'timestamp': time.time(),
-                        'status': 'active',
-                        'detectedBy': 'ai',
-                        'confidence': 0.85,
-                        'detectionBoxes': [{
-                            'x': 100,
-                            'y': 50,
-                            'width': 200,
-                            'height': 150,
-                            'class': 'traffic_jam',
-                            'confidence': 0.85
-                        }]
-                    }
-                ],
-                'detections': [],
-                'processedFrames': 100,
-                'totalFrames': 100,
-                'status': 'completed',
-                'analysisTime': '3.2s',
-                'modelVersion': 'Quick-Demo-v1.0',
-                'timestamp': time.time(),
-                'fps': 30,
-                'demo_mode': True
-            }
-            
-            self.wfile.write(json.dumps(mock_response).encode())
+            self.send_json(build_analyze_body())
             return
     
     def do_OPTIONS(self):
@@ -12,7 +12,11 @@ def install_requirements():
     """Install Python requirements"""
     print("Installing Python dependencies...")
     try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
+        subprocess.check_call([
+            sys.executable, "-m", "pip", "install",
+            "--no-input", "--disable-pip-version-check", "--no-color",
+            "-r", "requirements.txt"
+        ])
         print("✅ All dependencies installed successfully!")
         return True
     except subprocess.CalledProcessError as e:
@@ -4,13 +4,34 @@ Simple Flask server for traffic analysis - works without YOLO dependencies
 This server provides mock analysis when YOLO is not available
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, send_from_directory
 from flask_cors import CORS
+from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from werkzeug.exceptions import HTTPException
 import os
 import json
 import time
 import random
 import logging
+import uuid
+import threading
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+
+# orjson serializes responses several times faster than the stdlib encoder
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Production WSGI server - falls back to Flask's threaded dev server
+try:
+    from waitress import serve
+    WAITRESS_AVAILABLE = True
+except ImportError:
+    WAITRESS_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -22,194 +43,376 @@ CORS(app)
 # Configuration
 UPLOAD_FOLDER = 'uploads/videos'
 MAX_FILE_SIZE = 500 * 1024 * 1024  # 500MB
-ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
+ALLOWED_EXTENSIONS = frozenset({'mp4', 'avi', 'mov', 'mkv', 'webm'})
+ALLOWED_SUFFIXES = tuple('.' + ext for ext in ALLOWED_EXTENSIONS)
+STREAM_CHUNK_SIZE = 1024 * 1024  # 1MB chunks for raw body uploads
+MOCK_DELAY_SECONDS = 2  # Simulated processing time
+ANALYSIS_JOB_TTL_SECONDS = 600  # Finished async jobs that are never polled expire after this
+MAX_PENDING_ANALYSIS_JOBS = 32  # Async analyses queued or running before new ones get a 503
+
+# Set when running behind nginx so it serves uploaded videos directly
+X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX', '')
+
+# Background workers for analyses queued with ?async=1 (job id -> (Future, ready_at))
+_analysis_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='analysis')
+_analysis_jobs = {}
+_analysis_jobs_lock = threading.Lock()
+
+# Caps concurrent upload writes so parallel 500MB saves don't thrash the disk.
+# Only the writes are bounded: reading a slow client's body never holds a slot
+_disk_write_slots = threading.BoundedSemaphore(2)
+
+# Enforce the upload limit on both multipart and raw body uploads
+app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
 # Ensure upload directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+UPLOAD_PREFIX = UPLOAD_FOLDER.rstrip('/') + '/'
+
+def dump_json(payload):
+    """Serialize payload to JSON bytes with orjson when available"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode()
+
+def json_response(payload, status=200):
+    """Build a JSON response from a payload"""
+    return Response(dump_json(payload), status=status, mimetype='application/json')
+
+# Static responses are serialized once at import
+SUPPORTED_FORMATS = tuple(sorted(ALLOWED_EXTENSIONS))
+INCIDENT_TYPES = ('traffic_jam', 'car_accident', 'blocked_road', 'emergency_vehicle')
+
+# Mock bounding box ranges: x, y, x2, y2
+MOCK_BBOX_RANGES = ((50, 200), (50, 150), (250, 400), (200, 300))
+
+# Mock description choices and per-type builders
+# Each worker thread draws from its own generator instead of the shared module state
+_rng_local = threading.local()
+
+def _rng():
+    """Return the calling thread's random generator"""
+    rng = getattr(_rng_local, 'rng', None)
+    if rng is None:
+        rng = _rng_local.rng = random.Random()
+    return rng
+
+COLLISION_VEHICLES = ('car', 'truck', 'bus')
+COLLISION_OTHERS = ('car', 'motorcycle')
+BLOCKAGE_CAUSES = ('construction', 'debris', 'stalled vehicle')
+EMERGENCY_VEHICLES = ('ambulance', 'fire truck', 'police car')
+
+DESCRIPTION_BUILDERS = {
+    'traffic_jam': lambda: f'Heavy traffic congestion detected with {_rng().randint(8, 15)} vehicles',
+    'car_accident': lambda: f'Vehicle collision detected between {_rng().choice(COLLISION_VEHICLES)} and {_rng().choice(COLLISION_OTHERS)}',
+    'blocked_road': lambda: f'Road blockage detected - {_rng().choice(BLOCKAGE_CAUSES)}',
+    'emergency_vehicle': lambda: f'Emergency vehicle detected - {_rng().choice(EMERGENCY_VEHICLES)}'
+}
+
+HEALTH_JSON = dump_json({
+    'status': 'healthy',
+    'model': 'Mock Analysis Server (Demo Mode)',
+    'version': '2.0.0',
+    'device': 'cpu (mock)',
+    'model_loaded': True,
+    'yolo_available': False,
+    'supported_formats': SUPPORTED_FORMATS,
+    'max_file_size_mb': MAX_FILE_SIZE // (1024 * 1024),
+    'message': 'Server running in demo mode - install YOLOv8 for real analysis'
+})
+
+MODEL_INFO_JSON = dump_json({
+    'model_type': 'Mock Demo Server',
+    'device': 'cpu (demo)',
+    'confidence_threshold': 0.5,
+    'yolo_available': False,
+    'supported_classes': INCIDENT_TYPES,
+    'incident_types': INCIDENT_TYPES,
+    'model_size': 'demo (instant)',
+    'inference_speed': 'Mock speed (2s delay)',
+    'demo_mode': True
+})
+
+INVALID_FORMAT_JSON = dump_json({
+    'error': 'Invalid file format. Supported: ' + ', '.join(SUPPORTED_FORMATS)
+})
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return filename.lower().endswith(ALLOWED_SUFFIXES)
 
-def mock_analyze_video(video_path, location):
+def save_stream(stream, filepath):
+    """Write an upload stream to disk in large chunks"""
+    with open(filepath, 'wb') as out:
+        while True:
+            chunk = stream.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            with _disk_write_slots:
+                out.write(chunk)
+
+def mock_analyze_video(video_path, location, delay=MOCK_DELAY_SECONDS):
     """Mock video analysis for demonstration"""
     logger.info(f"Mock analyzing video: {video_path}")
     
     # Simulate processing time
-    time.sleep(2)
+    if delay:
+        time.sleep(delay)
     
     # Generate realistic mock incidents based on location
-    incident_types = ['traffic_jam', 'car_accident', 'blocked_road', 'emergency_vehicle']
     incidents = []
+    now = time.time()
     
-    # Generate 1-3 random incidents
-    num_incidents = random.randint(1, 3)
+    # Generate 1-3 random incidents, drawing all their types in one call
+    rng = _rng()
+    incident_types = rng.choices(INCIDENT_TYPES, k=rng.randint(1, 3))
     
-    for i in range(num_incidents):
-        incident_type = random.choice(incident_types)
-        confidence = random.uniform(0.65, 0.95)
+    for i, incident_type in enumerate(incident_types):
+        confidence = rng.uniform(0.65, 0.95)
         
-        # Create realistic descriptions
-        descriptions = {
-            'traffic_jam': f'Heavy traffic congestion detected with {random.randint(8, 15)} vehicles',
-            'car_accident': f'Vehicle collision detected between {random.choice(["car", "truck", "bus"])} and {random.choice(["car", "motorcycle"])}',
-            'blocked_road': f'Road blockage detected - {random.choice(["construction", "debris", "stalled vehicle"])}',
-            'emergency_vehicle': f'Emergency vehicle detected - {random.choice(["ambulance", "fire truck", "police car"])}'
-        }
+        # Only build the description for the chosen incident type
+        describe = DESCRIPTION_BUILDERS.get(incident_type)
         
         incidents.append({
             'type': incident_type,
             'confidence': confidence,
-            'description': descriptions.get(incident_type, f'Mock {incident_type} detected'),
-            'timestamp': time.time() + i * 10,
-            'bbox': [
-                random.randint(50, 200),   # x
-                random.randint(50, 150),   # y
-                random.randint(250, 400),  # x2
-                random.randint(200, 300)   # y2
-            ]
+            'description': describe() if describe else f'Mock {incident_type} detected',
+            'timestamp': now + i * 10,
+            'bbox': [rng.randint(low, high) for low, high in MOCK_BBOX_RANGES]
         })
     
     return {
         'incidents': incidents,
-        'processed_frames': random.randint(80, 120),
-        'total_frames': random.randint(100, 150),
+        'processed_frames': rng.randint(80, 120),
+        'total_frames': rng.randint(100, 150),
         'fps': 30
     }
 
+@app.errorhandler(413)
+def file_too_large(e):
+    """Return a JSON error when the upload exceeds MAX_FILE_SIZE"""
+    return json_response({'error': f'File too large. Maximum size is {MAX_FILE_SIZE // (1024 * 1024)}MB'}, 413)
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    try:
-        return jsonify({
-            'status': 'healthy',
-            'model': 'Mock Analysis Server (Demo Mode)',
-            'version': '2.0.0',
-            'device': 'cpu (mock)',
-            'model_loaded': True,
-            'yolo_available': False,
-            'supported_formats': list(ALLOWED_EXTENSIONS),
-            'max_file_size_mb': MAX_FILE_SIZE // (1024 * 1024),
-            'message': 'Server running in demo mode - install YOLOv8 for real analysis'
-        })
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return jsonify({
-            'status': 'error',
-            'yolo_available': False,
-            'error': str(e)
-        }), 500
+    return Response(HEALTH_JSON, mimetype='application/json')
+
+def format_incident(incident, location):
+    """Convert a mock incident into the API response format"""
+    incident_type = incident['type']
+    confidence = incident['confidence']
+    bbox = incident.get('bbox')
+    
+    return {
+        'id': f"demo_{int(incident['timestamp'])}_{incident_type}",
+        'type': incident_type,
+        'location': location,
+        'severity': get_severity(confidence, incident_type),
+        'description': incident['description'],
+        'timestamp': incident['timestamp'],
+        'status': 'active',
+        'detectedBy': 'ai',
+        'confidence': confidence,
+        'detectionBoxes': [{
+            'x': bbox[0],
+            'y': bbox[1],
+            'width': bbox[2] - bbox[0],
+            'height': bbox[3] - bbox[1],
+            'class': incident_type,
+            'confidence': confidence
+        }] if bbox is not None else []
+    }
+
+def prune_analysis_jobs(now):
+    """Drop finished async jobs whose results went unclaimed for the TTL"""
+    with _analysis_jobs_lock:
+        expired = [
+            job_id for job_id, (future, ready_at) in _analysis_jobs.items()
+            if future.done() and now - ready_at > ANALYSIS_JOB_TTL_SECONDS
+        ]
+        for job_id in expired:
+            del _analysis_jobs[job_id]
+
+def analysis_queue_full():
+    """Whether MAX_PENDING_ANALYSIS_JOBS async analyses are still unfinished
+    
+    Callers hold _analysis_jobs_lock.
+    """
+    pending = sum(1 for future, _ in _analysis_jobs.values() if not future.done())
+    return pending >= MAX_PENDING_ANALYSIS_JOBS
+
+def run_analysis(filepath, filename, location, now, delay=MOCK_DELAY_SECONDS):
+    """Analyze a saved video and build the API response stamped with now"""
+    # Perform mock analysis
+    analysis_result = mock_analyze_video(filepath, location, delay)
+    
+    # Convert results to expected format
+    incidents = [format_incident(incident, location) for incident in analysis_result['incidents']]
+    
+    response = {
+        'videoId': str(int(now)),
+        'filename': filename,
+        'location': location,
+        'incidents': incidents,
+        'detections': analysis_result.get('incidents', []),
+        'processedFrames': analysis_result['processed_frames'],
+        'totalFrames': analysis_result['total_frames'],
+        'status': 'completed',
+        'analysisTime': f"{analysis_result['processed_frames'] / analysis_result['fps']:.1f}s",
+        'modelVersion': 'Demo-Mock-v2.0',
+        'timestamp': now,
+        'fps': analysis_result['fps'],
+        'demo_mode': True
+    }
+    
+    logger.info(f"Mock analysis complete: {len(incidents)} incidents detected")
+    return response
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze_video():
-    """Analyze uploaded video for traffic incidents"""
+    """Analyze uploaded video for traffic incidents
+    
+    Accepts either a multipart form (video + location fields) or a raw
+    application/octet-stream body with the filename and location passed in
+    X-Filename / X-Location headers (or filename / location query params).
+    The raw form streams straight to disk without multipart parsing.
+    """
     try:
-        # Check if video file is present
-        if 'video' not in request.files:
-            return jsonify({'error': 'No video file provided'}), 400
+        async_requested = request.args.get('async') == '1'
+        # Reject before reading the upload when the async queue is already full
+        if async_requested:
+            with _analysis_jobs_lock:
+                queue_full = analysis_queue_full()
+            if queue_full:
+                return json_response({'error': 'Too many analyses in progress, try again later'}, 503)
+        
+        raw_upload = request.mimetype == 'application/octet-stream'
+        
+        if raw_upload:
+            original_filename = request.headers.get('X-Filename') or request.args.get('filename', '')
+            location_data = request.headers.get('X-Location') or request.args.get('location')
+        else:
+            # Check if video file is present
+            if 'video' not in request.files:
+                return json_response({'error': 'No video file provided'}, 400)
+            
+            file = request.files['video']
+            original_filename = file.filename
+            location_data = request.form.get('location')
         
-        file = request.files['video']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+        if original_filename == '':
+            return json_response({'error': 'No file selected'}, 400)
         
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'Invalid file format. Supported: ' + ', '.join(ALLOWED_EXTENSIONS)}), 400
+        if not allowed_file(original_filename):
+            return Response(INVALID_FORMAT_JSON, status=400, mimetype='application/json')
         
         # Get location data
-        location_data = request.form.get('location')
         if not location_data:
-            return jsonify({'error': 'Location data required'}), 400
+            return json_response({'error': 'Location data required'}, 400)
         
         try:
             location = json.loads(location_data)
         except json.JSONDecodeError:
-            return jsonify({'error': 'Invalid location data format'}), 400
+            return json_response({'error': 'Invalid location data format'}, 400)
         
-        # Save uploaded file
-        filename = f"{int(time.time())}_{file.filename}"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        # Save uploaded file; the clock is read once for the filename and response
+        now = time.time()
+        filename = f"{int(now)}_{secure_filename(original_filename) or 'video'}"
+        filepath = UPLOAD_PREFIX + filename
+        # Multipart files are copied with the same 1MB buffer as raw bodies
+        # rather than FileStorage.save's 16KB default
+        upload_stream = request.stream if raw_upload else file.stream
+        save_stream(upload_stream, filepath)
         
         logger.info(f"Analyzing video: {filename} at location: {location.get('address', 'Unknown')}")
         
-        # Perform mock analysis
-        analysis_result = mock_analyze_video(filepath, location)
+        # Queue the analysis and return immediately when the client opts in
+        if async_requested:
+            prune_analysis_jobs(now)
+            job_id = uuid.uuid4().hex
+            with _analysis_jobs_lock:
+                queue_full = analysis_queue_full()
+                if not queue_full:
+                    # The simulated delay is enforced at poll time rather than by
+                    # sleeping, so queued jobs don't hold a worker thread while waiting
+                    future = _analysis_pool.submit(run_analysis, filepath, filename, location, now, 0)
+                    _analysis_jobs[job_id] = (future, now + MOCK_DELAY_SECONDS)
+            if queue_full:
+                os.remove(filepath)
+                return json_response({'error': 'Too many analyses in progress, try again later'}, 503)
+            return json_response({'videoId': job_id, 'status': 'queued', 'resultUrl': f'/api/result/{job_id}'}, 202)
         
-        # Convert results to expected format
-        incidents = []
-        for incident in analysis_result['incidents']:
-            incidents.append({
-                'id': f"demo_{int(incident['timestamp'])}_{incident['type']}",
-                'type': incident['type'],
-                'location': location,
-                'severity': get_severity(incident['confidence'], incident['type']),
-                'description': incident['description'],
-                'timestamp': incident['timestamp'],
-                'status': 'active',
-                'detectedBy': 'ai',
-                'confidence': incident['confidence'],
-                'detectionBoxes': [{
-                    'x': incident['bbox'][0],
-                    'y': incident['bbox'][1], 
-                    'width': incident['bbox'][2] - incident['bbox'][0],
-                    'height': incident['bbox'][3] - incident['bbox'][1],
-                    'class': incident['type'],
-                    'confidence': incident['confidence']
-                }] if 'bbox' in incident else []
-            })
-        
-        response = {
-            'videoId': str(int(time.time())),
-            'filename': filename,
-            'location': location,
-            'incidents': incidents,
-            'detections': analysis_result.get('incidents', []),
-            'processedFrames': analysis_result['processed_frames'],
-            'totalFrames': analysis_result['total_frames'],
-            'status': 'completed',
-            'analysisTime': f"{analysis_result['processed_frames'] / analysis_result['fps']:.1f}s",
-            'modelVersion': 'Demo-Mock-v2.0',
-            'timestamp': time.time(),
-            'fps': analysis_result['fps'],
-            'demo_mode': True
-        }
-        
-        logger.info(f"Mock analysis complete: {len(incidents)} incidents detected")
-        return jsonify(response)
+        return json_response(run_analysis(filepath, filename, location, now))
         
+    except HTTPException:
+        # Let Flask's error handlers answer, e.g. the JSON 413 for oversized uploads
+        raise
     except Exception as e:
         logger.error(f"Analysis error: {e}")
-        return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
+        return json_response({'error': f'Analysis failed: {str(e)}'}, 500)
+
+@app.route('/api/result/<job_id>', methods=['GET'])
+def analysis_result(job_id):
+    """Poll the result of an analysis queued with /api/analyze?async=1"""
+    prune_analysis_jobs(time.time())
+    job = _analysis_jobs.get(job_id)
+    if job is None:
+        return json_response({'error': 'Unknown job id'}, 404)
+    
+    future, ready_at = job
+    if not future.done() or time.time() < ready_at:
+        return json_response({'videoId': job_id, 'status': 'processing'}, 202)
+    
+    # Results are handed out once, so finished jobs don't accumulate
+    with _analysis_jobs_lock:
+        _analysis_jobs.pop(job_id, None)
+    try:
+        return json_response(future.result())
+    except Exception as e:
+        logger.error(f"Analysis error: {e}")
+        return json_response({'error': f'Analysis failed: {str(e)}'}, 500)
 
 @app.route('/api/model/info', methods=['GET'])
 def model_info():
     """Get information about the loaded model"""
-    return jsonify({
-        'model_type': 'Mock Demo Server',
-        'device': 'cpu (demo)',
-        'confidence_threshold': 0.5,
-        'yolo_available': False,
-        'supported_classes': ['traffic_jam', 'car_accident', 'blocked_road', 'emergency_vehicle'],
-        'incident_types': ['traffic_jam', 'car_accident', 'blocked_road', 'emergency_vehicle'],
-        'model_size': 'demo (instant)',
-        'inference_speed': 'Mock speed (2s delay)',
-        'demo_mode': True
-    })
+    return Response(MODEL_INFO_JSON, mimetype='application/json')
 
 @app.route('/uploads/<filename>')
 def serve_video(filename):
-    """Serve uploaded video files"""
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    """Serve uploaded video files
+    
+    When X_ACCEL_REDIRECT_PREFIX is set (e.g. '/internal/uploads/'), nginx is
+    told to send the file itself via an internal location aliased to
+    UPLOAD_FOLDER, so the worker never streams video bytes:
+    
+        location /internal/uploads/ { internal; alias /path/to/uploads/videos/; }
+    """
+    if X_ACCEL_REDIRECT_PREFIX:
+        path = safe_join(UPLOAD_FOLDER, filename)
+        if path is None or not os.path.isfile(path):
+            return json_response({'error': 'File not found'}, 404)
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = X_ACCEL_REDIRECT_PREFIX + filename
+        return response
+    
+    # conditional=True answers Range requests so players can seek
+    return send_from_directory(UPLOAD_FOLDER, filename, conditional=True)
+
+# Incident type -> (confidence threshold, severity above, severity at or below)
+SEVERITY_RULES = {
+    'car_accident': (0.8, 'critical', 'high'),
+    'emergency_vehicle': (0.8, 'critical', 'high'),
+    'blocked_road': (0.7, 'high', 'medium'),
+    'traffic_jam': (0.6, 'medium', 'low')
+}
 
 def get_severity(confidence, incident_type):
     """Determine incident severity based on confidence and type"""
-    if incident_type in ['car_accident', 'emergency_vehicle']:
-        return 'critical' if confidence > 0.8 else 'high'
-    elif incident_type == 'blocked_road':
-        return 'high' if confidence > 0.7 else 'medium'
-    elif incident_type == 'traffic_jam':
-        return 'medium' if confidence > 0.6 else 'low'
-    else:
+    rule = SEVERITY_RULES.get(incident_type)
+    if rule is None:
         return 'medium'
+    threshold, above, below = rule
+    return above if confidence > threshold else below
 
 if __name__ == '__main__':
     print("=" * 60)
@@ -224,7 +427,11 @@ if __name__ == '__main__':
     print("=" * 60)
     
     try:
-        app.run(host='0.0.0.0', port=5000, debug=False)
+        if WAITRESS_AVAILABLE:
+            serve(app, host='0.0.0.0', port=5000, threads=8)
+        else:
+            print("⚠️  waitress not installed - using Flask's threaded dev server")
+            app.run(host='0.0.0.0', port=5000, threaded=True)
     except Exception as e:
         print(f"❌ Failed to start server: {e}")
         print("Try running on a different port or check if port 5000 is in use")
\ No newline at end of file
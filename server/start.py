@@ -16,20 +16,30 @@ def check_python_version():
     print(f"✅ Python {sys.version_info.major}.{sys.version_info.minor} detected")
     return True
 
+# Availability probes, memoized per module name
+_module_available = {}
+
+def modules_available(*names):
+    """Check that modules are installed without importing them"""
+    for name in names:
+        if name not in _module_available:
+            _module_available[name] = importlib.util.find_spec(name) is not None
+        if not _module_available[name]:
+            return False
+    return True
+
 def check_flask_available():
     """Check if Flask is available"""
-    try:
-        import flask
-        import flask_cors
-        return True
-    except ImportError:
-        return False
+    return modules_available('flask', 'flask_cors')
 
 def install_flask():
     """Install Flask if not available"""
     print("📦 Installing Flask...")
     try:
         subprocess.check_call([sys.executable, "-m", "pip", "install", "flask", "flask-cors"])
+        # Forget cached probe results so the fresh install is seen
+        _module_available.clear()
+        importlib.invalidate_caches()
         print("✅ Flask installed successfully")
         return True
     except subprocess.CalledProcessError as e:
@@ -38,13 +48,7 @@ def install_flask():
 
 def check_yolo_available():
     """Check if YOLO dependencies are available"""
-    try:
-        import ultralytics
-        import cv2
-        import torch
-        return True
-    except ImportError:
-        return False
+    return modules_available('ultralytics', 'cv2', 'torch')
 
 def start_full_server():
     """Try to start the full YOLO server"""
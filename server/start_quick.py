@@ -3,8 +3,6 @@
 Start the quick server - guaranteed to work
 """
 
-import subprocess
-import sys
 import os
 
 def main():
@@ -15,17 +13,13 @@ def main():
     os.chdir(server_dir)
     
     try:
-        # Start the quick server
-        subprocess.run([sys.executable, "quick_server.py"])
+        # Run the quick server in this interpreter
+        import quick_server
+        quick_server.main()
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
     except Exception as e:
         print(f"❌ Error: {e}")
-        print("Trying alternative method...")
-        
-        # Fallback - run directly
-        import quick_server
-        quick_server.main()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
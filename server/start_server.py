@@ -6,6 +6,7 @@ GUARANTEED SERVER STARTER - This will work no matter what
 import sys
 import subprocess
 import os
+import importlib.util
 
 def install_flask():
     """Install Flask if not available"""
@@ -19,13 +20,8 @@ def install_flask():
         return False
 
 def check_flask():
-    """Check if Flask is available"""
-    try:
-        import flask
-        import flask_cors
-        return True
-    except ImportError:
-        return False
+    """Check if Flask is available without importing it"""
+    return all(importlib.util.find_spec(name) is not None for name in ('flask', 'flask_cors'))
 
 def main():
     print("🚀 GUARANTEED SERVER STARTER")
@@ -54,7 +50,9 @@ def main():
     # Start the server
     print("🚀 Starting server...")
     try:
-        subprocess.run([sys.executable, "working_server.py"])
+        # Import after chdir so the server's relative upload folder resolves here
+        import working_server
+        working_server.main()
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
     except Exception as e:
@@ -6,6 +6,7 @@ This is for advanced users who want to train on custom datasets
 
 import os
 import yaml
+import torch
 from pathlib import Path
 from ultralytics import YOLO
 import logging
@@ -42,6 +43,9 @@ def train_model(dataset_config: str, epochs: int = 100, img_size: int = 640):
     """Train custom YOLOv8 model"""
     logger.info("Starting model training...")
     
+    # Input size is fixed, so let cuDNN pick the fastest convolution kernels
+    torch.backends.cudnn.benchmark = True
+    
     # Load a pre-trained YOLOv8 model
     model = YOLO('yolov8n.pt')  # Start with nano model for faster training
     
@@ -55,6 +59,9 @@ def train_model(dataset_config: str, epochs: int = 100, img_size: int = 640):
         patience=10,
         save=True,
         plots=True,
+        amp=True,  # Mixed precision training on tensor-core GPUs
+        cache='ram',  # Decode the dataset once instead of every epoch
+        workers=8,
         device='auto'  # Automatically use GPU if available
     )
     
@@ -73,7 +80,7 @@ def validate_model(model_path: str, dataset_config: str):
     
     return results
 
-def export_model(model_path: str):
+def export_model(model_path: str, dataset_config: str = None, int8: bool = False):
     """Export model to different formats"""
     logger.info("Exporting model...")
     
@@ -85,8 +92,9 @@ def export_model(model_path: str):
     
     # Export to TensorRT if available (for NVIDIA GPUs)
     try:
-        model.export(format='engine')
-        logger.info("Model exported to TensorRT format")
+        # INT8 calibrates on the dataset, otherwise build an FP16 engine
+        model.export(format='engine', half=not int8, int8=int8, data=dataset_config, workspace=4)
+        logger.info(f"Model exported to TensorRT format ({'int8' if int8 else 'fp16'})")
     except Exception as e:
         logger.warning(f"TensorRT export failed: {e}")
 
@@ -126,7 +134,7 @@ def main():
     validate_model(str(best_model), config_path)
     
     # Export model
-    export_model(str(best_model))
+    export_model(str(best_model), config_path)
     
     print("\n" + "=" * 50)
     print("🎉 Training completed!")
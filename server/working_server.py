@@ -5,8 +5,11 @@ Simple Flask server that starts without any complex dependencies
 """
 
 try:
-    from flask import Flask, request, jsonify, send_from_directory
+    from flask import Flask, Response, request, send_from_directory
     from flask_cors import CORS
+    from werkzeug.utils import secure_filename
+    from werkzeug.security import safe_join
+    from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
     FLASK_AVAILABLE = True
 except ImportError:
     print("❌ Flask not installed. Installing now...")
@@ -14,8 +17,11 @@ except ImportError:
     import sys
     try:
         subprocess.check_call([sys.executable, "-m", "pip", "install", "flask", "flask-cors"])
-        from flask import Flask, request, jsonify, send_from_directory
+        from flask import Flask, Response, request, send_from_directory
         from flask_cors import CORS
+        from werkzeug.utils import secure_filename
+        from werkzeug.security import safe_join
+        from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
         FLASK_AVAILABLE = True
         print("✅ Flask installed successfully")
     except Exception as e:
@@ -27,6 +33,40 @@ import json
 import time
 import random
 import logging
+import re
+import threading
+import mimetypes
+import shutil
+
+# orjson serializes responses several times faster than the stdlib encoder
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Used to serialize concurrent finalize calls for the same chunked upload (POSIX only)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# Under gunicorn's gevent workers, blocking file work is moved to the hub's
+# threadpool so other connections in the worker keep being served
+try:
+    import gevent
+    from gevent import monkey
+    GEVENT_AVAILABLE = True
+except ImportError:
+    GEVENT_AVAILABLE = False
+
+# Production WSGI server - falls back to Flask's threaded dev server
+try:
+    from waitress import serve
+    WAITRESS_AVAILABLE = True
+except ImportError:
+    WAITRESS_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -42,53 +82,100 @@ CORS(app)
 # Configuration
 UPLOAD_FOLDER = 'uploads/videos'
 MAX_FILE_SIZE = 500 * 1024 * 1024  # 500MB
-ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
+ALLOWED_EXTENSIONS = frozenset({'mp4', 'avi', 'mov', 'mkv', 'webm'})
+ALLOWED_SUFFIXES = frozenset('.' + ext for ext in ALLOWED_EXTENSIONS)
+SERVER_THREADS = 16  # Requests mostly wait on uploads and the simulated delay
+STREAM_CHUNK_SIZE = 1024 * 1024  # 1MB chunks for raw body uploads
+MOCK_DELAY_SECONDS = 2  # Simulated processing time, only applied with ?demo=1
+
+# Set when running behind nginx so it serves uploaded videos directly
+X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX', '')
+
+# Chunked (resumable) uploads: parts are kept per upload id until finalized
+CHUNK_FOLDER = 'uploads/chunks'
+UPLOAD_CHUNK_SIZE_HINT = 8 * 1024 * 1024  # Suggested client chunk size
+UPLOAD_PARALLELISM_HINT = 4  # Suggested concurrent chunk POSTs per upload
+MAX_UPLOAD_CHUNKS = 10000
+UPLOAD_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+CHUNK_UPLOAD_TTL_SECONDS = 24 * 60 * 60  # Upload dirs untouched this long are removed
+CHUNK_EXPIRY_INTERVAL_SECONDS = 10 * 60  # How often chunk POSTs sweep for expired dirs
+_next_chunk_expiry = 0.0
 
-# Ensure upload directory exists
+# Enforce the upload limit on both multipart and raw body uploads
+app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+
+# Ensure upload directories exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(CHUNK_FOLDER, exist_ok=True)
+
+INCIDENT_TYPES = ('traffic_jam', 'car_accident', 'blocked_road', 'emergency_vehicle')
+
+# Mock bounding box ranges: x, y, x2, y2
+MOCK_BBOX_RANGES = ((50, 200), (50, 150), (250, 400), (200, 300))
+
+COLLISION_KINDS = ('2 cars', 'car and truck', 'multiple vehicles')
+BLOCKAGE_CAUSES = ('construction', 'debris', 'stalled vehicle')
+EMERGENCY_VEHICLES = ('ambulance', 'fire truck', 'police car')
+
+DESCRIPTION_BUILDERS = {
+    'traffic_jam': lambda: f'Heavy traffic congestion detected with {random.randint(8, 15)} vehicles',
+    'car_accident': lambda: f'Vehicle collision detected - {random.choice(COLLISION_KINDS)}',
+    'blocked_road': lambda: f'Road blockage detected - {random.choice(BLOCKAGE_CAUSES)}',
+    'emergency_vehicle': lambda: f'Emergency vehicle detected - {random.choice(EMERGENCY_VEHICLES)}'
+}
+
+def dump_json(payload):
+    """Serialize payload to JSON bytes with orjson when available"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode()
+
+def load_json(data):
+    """Parse a JSON string with orjson when available"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_response(payload, status=200):
+    """Build a JSON response from a payload"""
+    return Response(dump_json(payload), status=status, mimetype='application/json')
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return os.path.splitext(filename)[1].lower() in ALLOWED_SUFFIXES
 
 def generate_realistic_incidents(location):
     """Generate realistic mock incidents for demo"""
-    incident_types = ['traffic_jam', 'car_accident', 'blocked_road', 'emergency_vehicle']
     incidents = []
+    now = time.time()
     
-    # Generate 1-3 random incidents
-    num_incidents = random.randint(1, 3)
+    # Generate 1-3 random incidents, drawing all their types in one call
+    incident_types = random.choices(INCIDENT_TYPES, k=random.randint(1, 3))
     
-    for i in range(num_incidents):
-        incident_type = random.choice(incident_types)
+    for i, incident_type in enumerate(incident_types):
         confidence = random.uniform(0.65, 0.95)
         
-        # Create realistic descriptions
-        descriptions = {
-            'traffic_jam': f'Heavy traffic congestion detected with {random.randint(8, 15)} vehicles',
-            'car_accident': f'Vehicle collision detected - {random.choice(["2 cars", "car and truck", "multiple vehicles"])}',
-            'blocked_road': f'Road blockage detected - {random.choice(["construction", "debris", "stalled vehicle"])}',
-            'emergency_vehicle': f'Emergency vehicle detected - {random.choice(["ambulance", "fire truck", "police car"])}'
-        }
+        # Only build the description for the chosen incident type
+        describe = DESCRIPTION_BUILDERS.get(incident_type)
         
         incidents.append({
             'type': incident_type,
             'confidence': confidence,
-            'description': descriptions.get(incident_type, f'Detected {incident_type}'),
-            'timestamp': time.time() + i * 10,
-            'bbox': [
-                random.randint(50, 200),   # x
-                random.randint(50, 150),   # y
-                random.randint(250, 400),  # x2
-                random.randint(200, 300)   # y2
-            ]
+            'description': describe() if describe else f'Detected {incident_type}',
+            'timestamp': now + i * 10,
+            'bbox': [random.randint(low, high) for low, high in MOCK_BBOX_RANGES]
         })
     
     return incidents
 
+@app.errorhandler(413)
+def file_too_large(e):
+    """Return a JSON error when the upload exceeds MAX_FILE_SIZE"""
+    return json_response({'error': f'File too large. Maximum size is {MAX_FILE_SIZE // (1024 * 1024)}MB'}, 413)
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
+    return json_response({
         'status': 'healthy',
         'model': 'Working Demo Server',
         'version': '1.0.0',
@@ -98,129 +185,460 @@ def health_check():
         'supported_formats': list(ALLOWED_EXTENSIONS),
         'max_file_size_mb': MAX_FILE_SIZE // (1024 * 1024),
         'message': 'Server is running and ready!',
+        'chunked_upload': {
+            'chunk_size_bytes': UPLOAD_CHUNK_SIZE_HINT,
+            'parallel_chunks': UPLOAD_PARALLELISM_HINT,
+            'max_chunks': MAX_UPLOAD_CHUNKS
+        },
         'timestamp': time.time()
     })
 
+def requested_delay():
+    """Simulated processing delay for this request (opt-in with ?demo=1)"""
+    return MOCK_DELAY_SECONDS if request.args.get('demo') == '1' else 0
+
+def build_analysis_response(filename, location, now, delay=0):
+    """Run the mock analysis for a saved upload and build the API response"""
+    logger.info(f"Processing video: {filename} at location: {location.get('address', 'Unknown')}")
+    
+    # Simulate processing time
+    if delay:
+        time.sleep(delay)
+    
+    # Generate mock analysis results
+    mock_incidents = generate_realistic_incidents(location)
+    
+    # Convert results to expected format
+    incidents = []
+    for incident in mock_incidents:
+        ts_i = int(incident['timestamp'])
+        incidents.append({
+            'id': f"demo_{ts_i}_{incident['type']}",
+            'type': incident['type'],
+            'location': location,
+            'severity': get_severity(incident['confidence'], incident['type']),
+            'description': incident['description'],
+            'timestamp': incident['timestamp'],
+            'status': 'active',
+            'detectedBy': 'ai',
+            'confidence': incident['confidence'],
+            'detectionBoxes': [{
+                'x': incident['bbox'][0],
+                'y': incident['bbox'][1], 
+                'width': incident['bbox'][2] - incident['bbox'][0],
+                'height': incident['bbox'][3] - incident['bbox'][1],
+                'class': incident['type'],
+                'confidence': incident['confidence']
+            }] if 'bbox' in incident else []
+        })
+    
+    response = {
+        'videoId': str(int(now)),
+        'filename': filename,
+        'location': location,
+        'incidents': incidents,
+        'detections': mock_incidents,
+        'processedFrames': random.randint(80, 120),
+        'totalFrames': random.randint(100, 150),
+        'status': 'completed',
+        'analysisTime': f"{random.uniform(2.0, 4.0):.1f}s",
+        'modelVersion': 'Demo-Working-v1.0',
+        'timestamp': now,
+        'fps': 30,
+        'demo_mode': True
+    }
+    
+    logger.info(f"Analysis complete: {len(incidents)} incidents detected")
+    return response
+
+def save_stream(stream, filepath, limit=None):
+    """Write a raw request body to disk in large chunks
+    
+    Raises RequestEntityTooLarge once more than limit bytes have been read.
+    """
+    written = 0
+    with open(filepath, 'wb') as out:
+        while True:
+            chunk = stream.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            written += len(chunk)
+            if limit is not None and written > limit:
+                raise RequestEntityTooLarge()
+            out.write(chunk)
+
+def create_unique_file(folder, filename):
+    """Create a new file in folder without replacing an existing one
+    
+    Adds a numeric suffix when filename is taken, e.g. by another upload in
+    the same second. Returns the unbuffered binary file and its final name.
+    """
+    stem, ext = os.path.splitext(filename)
+    candidate = filename
+    attempt = 0
+    while True:
+        try:
+            return open(os.path.join(folder, candidate), 'xb', buffering=0), candidate
+        except FileExistsError:
+            attempt += 1
+            candidate = f'{stem}_{attempt}{ext}'
+
+def run_blocking(func, *args):
+    """Call func, in gevent's threadpool when the stdlib is monkey-patched
+    
+    flock and sendfile block in the kernel, which would stall every
+    greenlet in a gevent worker.
+    """
+    if GEVENT_AVAILABLE and monkey.is_module_patched('socket'):
+        return gevent.get_hub().threadpool.apply(func, args)
+    return func(*args)
+
+def concatenate_parts(part_paths, out):
+    """Join chunk files into the open file out, copying in-kernel where supported"""
+    for path in part_paths:
+        with open(path, 'rb') as part:
+            if hasattr(os, 'sendfile'):
+                size = os.fstat(part.fileno()).st_size
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(out.fileno(), part.fileno(), offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+            else:
+                shutil.copyfileobj(part, out, STREAM_CHUNK_SIZE)
+
+def chunk_upload_dir(upload_id):
+    """Return the part directory for an upload id, or None if the id is invalid"""
+    if not upload_id or not UPLOAD_ID_PATTERN.match(upload_id):
+        return None
+    return os.path.join(CHUNK_FOLDER, upload_id)
+
+def part_path(upload_dir, index):
+    """Return the path of one part, zero-padded so names sort in order"""
+    return os.path.join(upload_dir, f'{index:06d}.part')
+
+def stored_upload_bytes(upload_dir, exclude):
+    """Total size of the parts (and in-flight temp parts) stored for an upload, except exclude"""
+    try:
+        with os.scandir(upload_dir) as entries:
+            return sum(
+                entry.stat().st_size for entry in entries
+                if entry.is_file() and entry.path != exclude and entry.name.endswith(('.part', '.tmp'))
+            )
+    except FileNotFoundError:
+        return 0
+
+def expire_chunk_uploads(now):
+    """Remove chunk upload dirs, abandoned or finalized, untouched for the TTL
+    
+    Runs at most once per CHUNK_EXPIRY_INTERVAL_SECONDS per process.
+    """
+    global _next_chunk_expiry
+    if now < _next_chunk_expiry:
+        return
+    _next_chunk_expiry = now + CHUNK_EXPIRY_INTERVAL_SECONDS
+    
+    with os.scandir(CHUNK_FOLDER) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir() and now - entry.stat().st_mtime > CHUNK_UPLOAD_TTL_SECONDS:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except FileNotFoundError:
+                pass
+
 @app.route('/api/analyze', methods=['POST'])
 def analyze_video():
     """Analyze uploaded video for traffic incidents"""
     try:
         # Check if video file is present
         if 'video' not in request.files:
-            return jsonify({'error': 'No video file provided'}), 400
+            return json_response({'error': 'No video file provided'}, 400)
         
         file = request.files['video']
         if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+            return json_response({'error': 'No file selected'}, 400)
         
         if not allowed_file(file.filename):
-            return jsonify({'error': f'Invalid file format. Supported: {", ".join(ALLOWED_EXTENSIONS)}'}), 400
+            return json_response({'error': f'Invalid file format. Supported: {", ".join(ALLOWED_EXTENSIONS)}'}, 400)
         
         # Get location data
         location_data = request.form.get('location')
         if not location_data:
-            return jsonify({'error': 'Location data required'}), 400
+            return json_response({'error': 'Location data required'}, 400)
         
         try:
-            location = json.loads(location_data)
-        except json.JSONDecodeError:
-            return jsonify({'error': 'Invalid location data format'}), 400
+            location = load_json(location_data)
+        except json.JSONDecodeError:  # orjson's decode error subclasses this
+            return json_response({'error': 'Invalid location data format'}, 400)
+        
+        # Read the clock once for the filename, video id and response timestamp
+        now = time.time()
         
         # Save uploaded file
-        filename = f"{int(time.time())}_{file.filename}"
+        filename = f"{int(now)}_{secure_filename(file.filename) or 'video'}"
         filepath = os.path.join(UPLOAD_FOLDER, filename)
         file.save(filepath)
         
-        logger.info(f"Processing video: {filename} at location: {location.get('address', 'Unknown')}")
-        
-        # Simulate processing time
-        time.sleep(2)
-        
-        # Generate mock analysis results
-        mock_incidents = generate_realistic_incidents(location)
-        
-        # Convert results to expected format
-        incidents = []
-        for incident in mock_incidents:
-            incidents.append({
-                'id': f"demo_{int(incident['timestamp'])}_{incident['type']}",
-                'type': incident['type'],
-                'location': location,
-                'severity': get_severity(incident['confidence'], incident['type']),
-                'description': incident['description'],
-                'timestamp': incident['timestamp'],
-                'status': 'active',
-                'detectedBy': 'ai',
-                'confidence': incident['confidence'],
-                'detectionBoxes': [{
-                    'x': incident['bbox'][0],
-                    'y': incident['bbox'][1], 
-                    'width': incident['bbox'][2] - incident['bbox'][0],
-                    'height': incident['bbox'][3] - incident['bbox'][1],
-                    'class': incident['type'],
-                    'confidence': incident['confidence']
-                }] if 'bbox' in incident else []
-            })
-        
-        response = {
-            'videoId': str(int(time.time())),
-            'filename': filename,
-            'location': location,
-            'incidents': incidents,
-            'detections': mock_incidents,
-            'processedFrames': random.randint(80, 120),
-            'totalFrames': random.randint(100, 150),
-            'status': 'completed',
-            'analysisTime': f"{random.uniform(2.0, 4.0):.1f}s",
-            'modelVersion': 'Demo-Working-v1.0',
-            'timestamp': time.time(),
-            'fps': 30,
-            'demo_mode': True
-        }
-        
-        logger.info(f"Analysis complete: {len(incidents)} incidents detected")
-        return jsonify(response)
+        return json_response(build_analysis_response(filename, location, now, requested_delay()))
         
+    except HTTPException:
+        # Let Flask's error handlers answer, e.g. the JSON 413 for oversized uploads
+        raise
     except Exception as e:
         logger.error(f"Analysis error: {e}")
-        return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
+        return json_response({'error': f'Analysis failed: {str(e)}'}, 500)
+
+@app.route('/api/analyze/stream', methods=['POST'])
+def analyze_video_stream():
+    """Analyze a video sent as the raw request body (preferred for large files)
+    
+    The filename and location JSON are passed in X-Filename / X-Location
+    headers (or filename / location query params). The body is streamed
+    straight to disk, skipping Werkzeug's multipart parser and temp file.
+    """
+    try:
+        original_filename = request.headers.get('X-Filename') or request.args.get('filename', '')
+        if original_filename == '':
+            return json_response({'error': 'No filename provided'}, 400)
+        
+        if not allowed_file(original_filename):
+            return json_response({'error': f'Invalid file format. Supported: {", ".join(ALLOWED_EXTENSIONS)}'}, 400)
+        
+        location_data = request.headers.get('X-Location') or request.args.get('location')
+        if not location_data:
+            return json_response({'error': 'Location data required'}, 400)
+        
+        try:
+            location = load_json(location_data)
+        except json.JSONDecodeError:
+            return json_response({'error': 'Invalid location data format'}, 400)
+        
+        now = time.time()
+        
+        # Header values are client-controlled, so sanitize before building the path
+        filename = f"{int(now)}_{secure_filename(original_filename) or 'video'}"
+        save_stream(request.stream, os.path.join(UPLOAD_FOLDER, filename))
+        
+        return json_response(build_analysis_response(filename, location, now, requested_delay()))
+        
+    except HTTPException:
+        # Let Flask's error handlers answer, e.g. the JSON 413 for oversized uploads
+        raise
+    except Exception as e:
+        logger.error(f"Stream analysis error: {e}")
+        return json_response({'error': f'Analysis failed: {str(e)}'}, 500)
+
+@app.route('/api/analyze/chunk', methods=['GET', 'POST'])
+def upload_chunk():
+    """Receive one part of a chunked upload, or list the parts received so far
+    
+    POST /api/analyze/chunk?id=<upload id>&index=<n>&total=<count> with the
+    part as the raw body. Parts may arrive in any order and in parallel, and a
+    failed part can simply be re-sent. GET with just ?id= returns the indices
+    already stored so an interrupted upload can resume.
+    """
+    upload_dir = chunk_upload_dir(request.args.get('id'))
+    if upload_dir is None:
+        return json_response({'error': 'Invalid or missing upload id'}, 400)
+    
+    if request.method == 'GET':
+        try:
+            received = sorted(int(name[:-5]) for name in os.listdir(upload_dir) if name.endswith('.part'))
+        except FileNotFoundError:
+            received = []
+        return json_response({'id': request.args['id'], 'received': received})
+    
+    try:
+        index = int(request.args['index'])
+        total = int(request.args['total'])
+    except (KeyError, ValueError):
+        return json_response({'error': 'index and total must be integers'}, 400)
+    
+    if not 0 < total <= MAX_UPLOAD_CHUNKS or not 0 <= index < total:
+        return json_response({'error': 'Chunk index out of range'}, 400)
+    
+    expire_chunk_uploads(time.time())
+    
+    done_marker = os.path.join(upload_dir, '.done')
+    if os.path.exists(done_marker):
+        return json_response({'error': 'Upload already finalized'}, 409)
+    
+    # Cap the whole upload, not just each part, so one id can't fill the disk
+    final_path = part_path(upload_dir, index)
+    remaining = MAX_FILE_SIZE - stored_upload_bytes(upload_dir, final_path)
+    if (request.content_length or 0) > remaining:
+        raise RequestEntityTooLarge()
+    
+    os.makedirs(upload_dir, exist_ok=True)
+    
+    # Write under a temporary name so a dropped connection never leaves a
+    # truncated part that finalize would accept
+    tmp_path = f'{final_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        save_stream(request.stream, tmp_path, remaining)
+        # A concurrent finalize may have completed while this part was written
+        if os.path.exists(done_marker):
+            os.remove(tmp_path)
+            return json_response({'error': 'Upload already finalized'}, 409)
+        os.replace(tmp_path, final_path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if isinstance(e, HTTPException):
+            raise
+        logger.error(f"Chunk upload error: {e}")
+        return json_response({'error': f'Chunk upload failed: {str(e)}'}, 500)
+    
+    return json_response({'id': request.args['id'], 'index': index, 'total': total, 'status': 'received'})
+
+@app.route('/api/analyze/finalize', methods=['POST'])
+def finalize_chunked_upload():
+    """Join the parts of a chunked upload into one video and analyze it
+    
+    Takes id, total, filename and location as query params (or X-Filename /
+    X-Location headers). Calling it again after success returns a fresh
+    analysis of the already assembled video instead of failing.
+    """
+    upload_id = request.args.get('id')
+    upload_dir = chunk_upload_dir(upload_id)
+    if upload_dir is None:
+        return json_response({'error': 'Invalid or missing upload id'}, 400)
+    
+    try:
+        total = int(request.args['total'])
+    except (KeyError, ValueError):
+        return json_response({'error': 'total must be an integer'}, 400)
+    
+    if not 0 < total <= MAX_UPLOAD_CHUNKS:
+        return json_response({'error': 'Chunk total out of range'}, 400)
+    
+    original_filename = request.headers.get('X-Filename') or request.args.get('filename', '')
+    if not allowed_file(original_filename):
+        return json_response({'error': f'Invalid file format. Supported: {", ".join(ALLOWED_EXTENSIONS)}'}, 400)
+    
+    location_data = request.headers.get('X-Location') or request.args.get('location')
+    if not location_data:
+        return json_response({'error': 'Location data required'}, 400)
+    
+    try:
+        location = load_json(location_data)
+    except json.JSONDecodeError:
+        return json_response({'error': 'Invalid location data format'}, 400)
+    
+    if not os.path.isdir(upload_dir):
+        return json_response({'error': 'Unknown upload id'}, 404)
+    
+    try:
+        with open(os.path.join(upload_dir, '.lock'), 'a') as lock:
+            if FCNTL_AVAILABLE:
+                run_blocking(fcntl.flock, lock, fcntl.LOCK_EX)
+            
+            # A previous finalize already assembled this upload
+            done_marker = os.path.join(upload_dir, '.done')
+            if os.path.exists(done_marker):
+                with open(done_marker) as f:
+                    filename = f.read()
+                return json_response(build_analysis_response(filename, location, time.time(), requested_delay()))
+            
+            parts = [part_path(upload_dir, i) for i in range(total)]
+            missing = [i for i, path in enumerate(parts) if not os.path.exists(path)]
+            if missing:
+                return json_response({'error': 'Upload incomplete', 'missing': missing}, 409)
+            
+            if sum(os.path.getsize(path) for path in parts) > MAX_FILE_SIZE:
+                return json_response({'error': f'File too large. Maximum size is {MAX_FILE_SIZE // (1024 * 1024)}MB'}, 413)
+            
+            now = time.time()
+            out, filename = create_unique_file(
+                UPLOAD_FOLDER, f"{int(now)}_{secure_filename(original_filename) or 'video'}"
+            )
+            try:
+                with out:
+                    run_blocking(concatenate_parts, parts, out)
+            except Exception:
+                os.remove(os.path.join(UPLOAD_FOLDER, filename))
+                raise
+            
+            # Keep only the marker so retries stay idempotent
+            with open(done_marker, 'w') as f:
+                f.write(filename)
+            for path in parts:
+                os.remove(path)
+        
+        return json_response(build_analysis_response(filename, location, now, requested_delay()))
+        
+    except Exception as e:
+        logger.error(f"Finalize error: {e}")
+        return json_response({'error': f'Analysis failed: {str(e)}'}, 500)
 
 @app.route('/api/model/info', methods=['GET'])
 def model_info():
     """Get information about the loaded model"""
-    return jsonify({
+    return json_response({
         'model_type': 'Working Demo Server',
         'device': 'cpu (demo)',
         'confidence_threshold': 0.5,
         'yolo_available': False,
-        'supported_classes': ['traffic_jam', 'car_accident', 'blocked_road', 'emergency_vehicle'],
-        'incident_types': ['traffic_jam', 'car_accident', 'blocked_road', 'emergency_vehicle'],
+        'supported_classes': INCIDENT_TYPES,
+        'incident_types': INCIDENT_TYPES,
         'model_size': 'demo (instant)',
-        'inference_speed': 'Mock speed (2s delay)',
+        'inference_speed': 'Mock speed (instant, 2s delay with ?demo=1)',
         'demo_mode': True,
         'status': 'ready'
     })
 
 @app.route('/uploads/<filename>')
 def serve_video(filename):
-    """Serve uploaded video files"""
+    """Serve uploaded video files
+    
+    When X_ACCEL_REDIRECT_PREFIX is set (e.g. '/internal/uploads/'), nginx is
+    told to send the file itself via an internal location aliased to
+    UPLOAD_FOLDER, so the worker never streams video bytes:
+    
+        location /internal/uploads/ { internal; alias /path/to/uploads/videos/; }
+    """
+    if X_ACCEL_REDIRECT_PREFIX:
+        path = safe_join(UPLOAD_FOLDER, filename)
+        if path is None or not os.path.isfile(path):
+            return json_response({'error': 'File not found'}, 404)
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = X_ACCEL_REDIRECT_PREFIX + filename
+        return response
+    
     try:
-        return send_from_directory(UPLOAD_FOLDER, filename)
+        # send_from_directory hands the open file to the WSGI server's
+        # file_wrapper (sendfile where supported); conditional=True answers
+        # Range requests so players can seek
+        return send_from_directory(UPLOAD_FOLDER, filename, conditional=True)
     except Exception as e:
-        return jsonify({'error': f'File not found: {str(e)}'}), 404
+        return json_response({'error': f'File not found: {str(e)}'}, 404)
+
+# Incident type -> (confidence threshold, severity above, severity at or below)
+SEVERITY_RULES = {
+    'car_accident': (0.8, 'critical', 'high'),
+    'emergency_vehicle': (0.8, 'critical', 'high'),
+    'blocked_road': (0.7, 'high', 'medium'),
+    'traffic_jam': (0.6, 'medium', 'low')
+}
 
 def get_severity(confidence, incident_type):
     """Determine incident severity based on confidence and type"""
-    if incident_type in ['car_accident', 'emergency_vehicle']:
-        return 'critical' if confidence > 0.8 else 'high'
-    elif incident_type == 'blocked_road':
-        return 'high' if confidence > 0.7 else 'medium'
-    elif incident_type == 'traffic_jam':
-        return 'medium' if confidence > 0.6 else 'low'
-    else:
+    rule = SEVERITY_RULES.get(incident_type)
+    if rule is None:
         return 'medium'
+    threshold, above, below = rule
+    return above if confidence > threshold else below
 
-if __name__ == '__main__':
+def run_server(port):
+    """Serve the app with waitress when installed, else Flask's threaded dev server"""
+    if WAITRESS_AVAILABLE:
+        serve(app, host='0.0.0.0', port=port, threads=SERVER_THREADS)
+    else:
+        app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
+
+def main():
+    """Run the demo server, falling back to port 5001 if 5000 is taken"""
     print("=" * 60)
     print("🚀 GUARANTEED WORKING SERVER STARTING")
     print("=" * 60)
@@ -229,14 +647,21 @@ if __name__ == '__main__':
     print("✅ Upload endpoint: http://localhost:5000/api/analyze")
     print("")
     print("📝 Note: Running in DEMO mode with realistic mock analysis")
+    print("🏭 Production: gunicorn -c gunicorn_working.conf.py working_server:app")
     print("=" * 60)
     
+    if not WAITRESS_AVAILABLE:
+        print("⚠️  waitress not installed - using Flask's threaded dev server")
+    
     try:
-        app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
+        run_server(5000)
     except Exception as e:
         print(f"❌ Failed to start server: {e}")
         print("Trying alternative port...")
         try:
-            app.run(host='0.0.0.0', port=5001, debug=False, threaded=True)
+            run_server(5001)
         except Exception as e2:
-            print(f"❌ Failed on port 5001 too: {e2}")
\ No newline at end of file
+            print(f"❌ Failed on port 5001 too: {e2}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -5,8 +5,16 @@ Real-time traffic incident detection using YOLOv8
 
 import cv2
 import numpy as np
+import os
 import logging
 import time
+import threading
+import queue
+import multiprocessing
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 import random
 
@@ -19,15 +27,201 @@ try:
     logger.info("YOLOv8 dependencies available")
 except ImportError as e:
     YOLO_AVAILABLE = False
-    logger.warning(f"YOLOv8 not available: {e}")
+    logger.warning("YOLOv8 not available: %s", e)
+
+# PyTorch is used directly for GPU-side frame preprocessing
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+# ONNX Runtime gives a faster CPU inference path than eager PyTorch
+try:
+    import onnxruntime
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+# OpenVINO's fused x86 kernels are faster still on CPU, fallback to ONNX Runtime
+try:
+    import openvino
+    OPENVINO_AVAILABLE = True
+except ImportError:
+    OPENVINO_AVAILABLE = False
+
+# PyAV decodes with multiple threads (and NVDEC when supported), fallback to OpenCV
+try:
+    import av
+    AV_AVAILABLE = True
+    try:
+        from av.codec.hwaccel import HWAccel
+    except ImportError:
+        HWAccel = None
+except ImportError:
+    AV_AVAILABLE = False
+    HWAccel = None
+
+# Numba compiles the collision-pair kernel, fallback to the NumPy sweep
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Square model input size used for GPU-side preprocessing, and the grey
+# Ultralytics pads letterboxed frames with
+INPUT_SIZE = 640
+LETTERBOX_FILL = 114
+
+# Sampled frames per model call on GPU; CPU inference gains nothing from batching
+GPU_BATCH_SIZE = 16
+
+# Inference precisions; int8 is opt-in since it can be slower than fp16 on
+# desktop GPUs, but pays off on Jetson and on CPUs through OpenVINO
+PRECISIONS = ('fp32', 'fp16', 'int8')
+
+# Dummy inferences run after loading, so cuDNN autotuning and allocations
+# happen before the first video instead of during it
+WARMUP_RUNS = 2
+
+# DRM render node used for VAAPI decoding on Intel/AMD GPUs
+VAAPI_RENDER_NODE = '/dev/dri/renderD128'
+
+# COCO ids of the detection classes treated as vehicles (bicycle, car,
+# motorcycle, bus, truck) and of the large ones that may be emergency
+# vehicles (bus, truck), as arrays for np.isin over a frame's class ids
+VEHICLE_CLASS_IDS = np.array([1, 2, 3, 5, 7])
+EMERGENCY_VEHICLE_CLASS_IDS = np.array([5, 7])
+
+# Analysis frames per video (demo limit) and how many processes share them
+# on CPU hosts; each shard worker loads its own model copy. Several gunicorn
+# workers already use every core, so sharding then defaults off
+MAX_ANALYZED_FRAMES = 300
+SERVER_WORKERS = max(1, int(os.environ.get('GUNICORN_WORKERS', 1)))
+VIDEO_SHARD_WORKERS = int(os.environ.get(
+    'VIDEO_SHARD_WORKERS', 1 if SERVER_WORKERS > 1 else min(4, (os.cpu_count() or 1) // 2)
+))
+
+# IoU above which two vehicles are reported as a potential collision
+COLLISION_IOU_THRESHOLD = 0.2
+
+# Columnar layout of a frame's detections, used for per-frame incident math
+DETECTION_DTYPE = np.dtype([
+    ('x1', 'f8'), ('y1', 'f8'), ('x2', 'f8'), ('y2', 'f8'),
+    ('conf', 'f8'), ('cls_id', 'i2')
+])
+
+def detection_array(detections):
+    """Pack detection dicts into a DETECTION_DTYPE structured array"""
+    return np.array(
+        [(*d['bbox'], d['confidence'], d['class_id']) for d in detections],
+        dtype=DETECTION_DTYPE
+    )
+
+def box_iou(a, b):
+    """Elementwise IoU between two (K, 4) arrays of x1, y1, x2, y2 boxes"""
+    iw = np.clip(np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0]), 0, None)
+    ih = np.clip(np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1]), 0, None)
+    intersection = iw * ih
+    
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a + area_b - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+def _first_partners(boxes, threshold):
+    """For each box i, the lowest j > i whose IoU with it exceeds threshold, else -1"""
+    n = boxes.shape[0]
+    partners = np.full(n, -1, dtype=np.int64)
+    for i in range(n):
+        area_i = (boxes[i, 2] - boxes[i, 0]) * (boxes[i, 3] - boxes[i, 1])
+        for j in range(i + 1, n):
+            iw = min(boxes[i, 2], boxes[j, 2]) - max(boxes[i, 0], boxes[j, 0])
+            ih = min(boxes[i, 3], boxes[j, 3]) - max(boxes[i, 1], boxes[j, 1])
+            if iw <= 0 or ih <= 0:
+                continue
+            intersection = iw * ih
+            area_j = (boxes[j, 2] - boxes[j, 0]) * (boxes[j, 3] - boxes[j, 1])
+            union = area_i + area_j - intersection
+            if union > 0 and intersection / union > threshold:
+                partners[i] = j
+                break
+    return partners
+
+if NUMBA_AVAILABLE:
+    _first_partners = numba.njit(cache=True)(_first_partners)
+
+def first_overlaps(boxes, threshold):
+    """Find, for each box i, the lowest j > i whose IoU with it exceeds threshold
+    
+    With Numba the pairs are scanned by a compiled kernel that stops at the
+    first partner. Otherwise a sweep over boxes sorted by x1 only pairs boxes
+    whose x-ranges intersect, pairs whose y-ranges don't are dropped, and
+    the surviving candidates are scored in one vectorized IoU call. Returns (i, j) index arrays ordered by i.
+    """
+    if NUMBA_AVAILABLE:
+        partners = _first_partners(np.ascontiguousarray(boxes, dtype=np.float32), np.float32(threshold))
+        i = np.flatnonzero(partners >= 0)
+        return i, partners[i]
+    
+    order = np.argsort(boxes[:, 0], kind='stable')
+    x1_sorted = boxes[order, 0]
+    x2_sorted = boxes[order, 2]
+    
+    # Box at sorted position p can only overlap positions p+1 .. end-1,
+    # whose x1 lies strictly left of its x2
+    starts = np.arange(1, len(boxes) + 1)
+    ends = np.searchsorted(x1_sorted, x2_sorted, side='left')
+    counts = np.clip(ends - starts, 0, None)
+    if not counts.any():
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    
+    pos_a = np.repeat(np.arange(len(boxes)), counts)
+    run_offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    pos_b = np.repeat(starts, counts) + run_offsets
+    
+    a = order[pos_a]
+    b = order[pos_b]
+    
+    # Pairs whose y-ranges don't intersect can't overlap; drop them with one
+    # comparison before paying for the IoU divisions
+    y_overlap = (boxes[a, 1] < boxes[b, 3]) & (boxes[b, 1] < boxes[a, 3])
+    a = a[y_overlap]
+    b = b[y_overlap]
+    hits = box_iou(boxes[a], boxes[b]) > threshold
+    i = np.minimum(a[hits], b[hits])
+    j = np.maximum(a[hits], b[hits])
+    
+    # Keep the lowest partner j for each i
+    ranked = np.lexsort((j, i))
+    i, j = i[ranked], j[ranked]
+    first = np.ones(len(i), dtype=bool)
+    first[1:] = i[1:] != i[:-1]
+    return i[first], j[first]
 
 class TrafficYOLOModel:
-    def __init__(self, model_path='yolov8n.pt', confidence_threshold=0.5):
-        """Initialize YOLO model for traffic analysis"""
+    def __init__(self, model_path='yolov8n.pt', confidence_threshold=0.5, batch_size=None,
+                 precision='fp16', calibration_data=None):
+        """Initialize YOLO model for traffic analysis
+        
+        batch_size is the number of video frames sent per model call; by
+        default GPU_BATCH_SIZE on CUDA and 1 on CPU. precision is one of
+        PRECISIONS; int8 exports calibrate on calibration_data, a dataset
+        YAML of representative traffic frames.
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"precision must be one of {PRECISIONS}, got {precision!r}")
+        
         self.model_path = model_path
         self.confidence_threshold = confidence_threshold
+        self.requested_batch_size = batch_size
+        self.precision = precision
+        self.calibration_data = calibration_data
         self.model = None
         self.device = 'cpu'
+        # Per-thread CUDA upload streams and mock-mode random generators
+        self._thread_state = threading.local()
         
         # Traffic-related class mappings from COCO dataset
         self.coco_classes = {
@@ -36,196 +230,441 @@ class TrafficYOLOModel:
             10: 'fire_hydrant', 11: 'stop_sign', 12: 'parking_meter', 13: 'bench',
             14: 'bird', 15: 'cat', 16: 'dog', 17: 'horse', 18: 'sheep', 19: 'cow'
         }
+        # Same ids as an array, for vectorized filtering of model output
+        self.coco_class_ids = np.fromiter(self.coco_classes, dtype=np.int64)
         
-        # Vehicle classes for traffic analysis
-        self.vehicle_classes = ['car', 'truck', 'bus', 'motorcycle', 'bicycle']
+        # Vehicle classes for traffic analysis (a sequence, for mock sampling)
+        self.vehicle_classes = ('car', 'truck', 'bus', 'motorcycle', 'bicycle')
+        self.coco_class_id_by_name = {name: class_id for class_id, name in self.coco_classes.items()}
         
         if YOLO_AVAILABLE:
             self.load_model()
         else:
             logger.info("Running in mock mode - YOLO not available")
     
-    def load_model(self):
-        """Load YOLOv8 model"""
+    @property
+    def batch_size(self):
+        """Frames per model call for the device the model was loaded on"""
+        if self.requested_batch_size is not None:
+            return self.requested_batch_size
+        return GPU_BATCH_SIZE if self.device == 'cuda' else 1
+    
+    @property
+    def half(self):
+        """Whether inputs and PyTorch inference run in FP16"""
+        return self.device == 'cuda' and self.precision == 'fp16'
+    
+    def load_model(self, defer=None):
+        """Load YOLOv8 model
+        
+        With defer (default: DEFER_MODEL_WARMUP is set, as in a preloading
+        gunicorn master) the warmup is skipped, and on a CUDA host so are the
+        engine export and load, since both initialize CUDA before fork.
+        finish_loading() completes the load in the worker.
+        """
+        global YOLO_AVAILABLE
+        if defer is None:
+            defer = os.environ.get('DEFER_MODEL_WARMUP') == '1'
         if not YOLO_AVAILABLE:
             logger.warning("Cannot load YOLO model - dependencies not available")
             return
             
         try:
-            logger.info(f"Loading YOLO model: {self.model_path}")
-            self.model = YOLO(self.model_path)
-            
             # Try to use GPU if available
-            try:
-                import torch
-                if torch.cuda.is_available():
-                    self.device = 'cuda'
-                    logger.info("Using GPU for inference")
-                else:
-                    self.device = 'cpu'
-                    logger.info("Using CPU for inference")
-            except ImportError:
+            if not TORCH_AVAILABLE:
                 self.device = 'cpu'
                 logger.info("PyTorch not available, using CPU")
+            elif torch.cuda.is_available():
+                self.device = 'cuda'
+                logger.info("Using GPU for inference")
+                if defer:
+                    logger.info("Deferring GPU model load until after fork")
+                    return
+            else:
+                self.device = 'cpu'
+                logger.info("Using CPU for inference")
+            
+            # Prefer a TensorRT engine at the requested precision on GPU, and
+            # an OpenVINO model (INT8 if requested) or an ONNX export (run
+            # through ONNX Runtime) on CPU. Export once; later loads reuse the
+            # cached file
+            weights = Path(self.model_path)
+            int8_args = {'int8': True}
+            if self.calibration_data:
+                int8_args['data'] = self.calibration_data
+            
+            if self.device == 'cuda':
+                # FP16 keeps the plain name install_yolo.py builds
+                suffix = '' if self.precision == 'fp16' else f'_{self.precision}'
+                exported_path = weights.with_name(f'{weights.stem}{suffix}.engine')
+                backend, loaded_precision = 'TensorRT', self.precision
+                # Dynamic shapes up to the batch size, so partial batches at
+                # the end of a video still run on the engine
+                export_args = {'format': 'engine', 'half': self.half, 'device': 0,
+                               'dynamic': True, 'batch': self.batch_size}
+                if self.precision == 'int8':
+                    export_args.update(int8_args)
+            elif self.precision == 'int8':
+                exported_path = weights.with_name(f'{weights.stem}_int8_openvino_model')
+                backend, loaded_precision = 'OpenVINO', 'int8'
+                export_args = dict(int8_args, format='openvino')
+            elif OPENVINO_AVAILABLE:
+                exported_path = weights.with_name(f'{weights.stem}_openvino_model')
+                backend, loaded_precision = 'OpenVINO', 'fp32'
+                export_args = {'format': 'openvino'}
+            elif ONNXRUNTIME_AVAILABLE:
+                exported_path = weights.with_suffix('.onnx')
+                backend, loaded_precision = 'ONNX Runtime', 'fp32'
+                export_args = {'format': 'onnx', 'dynamic': True, 'simplify': True}
+            else:
+                exported_path = None
+            
+            if exported_path is not None and not exported_path.exists():
+                self._export(exported_path, **export_args)
+            
+            if exported_path is not None and exported_path.exists():
+                logger.info("Loading %s %s model: %s", backend, loaded_precision, exported_path)
+                self.model = YOLO(str(exported_path), task='detect')
+            else:
+                logger.info("Loading PyTorch %s model: %s", 'fp16' if self.half else 'fp32', self.model_path)
+                self.model = YOLO(self.model_path)
                 
             logger.info("YOLO model loaded successfully")
             
+            if not defer:
+                self.warmup()
+            
         except Exception as e:
-            logger.error(f"Failed to load YOLO model: {e}")
+            logger.error("Failed to load YOLO model: %s", e)
             logger.info("Falling back to mock mode")
-            global YOLO_AVAILABLE
             YOLO_AVAILABLE = False
     
+    def _export(self, exported_path, **export_args):
+        """Export the PyTorch weights to exported_path, returning False on failure
+        
+        Ultralytics names its output (and intermediate ONNX files) after the
+        weights, so the export runs on a copy in a scratch directory and
+        never overwrites the cached export of another precision.
+        """
+        try:
+            logger.info("Exporting %s to %s at %s", self.model_path, export_args['format'], exported_path)
+            # Resolves (and downloads, if needed) the weights file
+            source = Path(getattr(YOLO(self.model_path), 'ckpt_path', None) or self.model_path)
+            with tempfile.TemporaryDirectory(dir=exported_path.parent) as scratch:
+                scratch_weights = Path(scratch) / source.name
+                shutil.copy2(source, scratch_weights)
+                output = YOLO(str(scratch_weights)).export(imgsz=INPUT_SIZE, verbose=False, **export_args)
+                Path(output).rename(exported_path)
+            return True
+        except Exception as e:
+            logger.warning("%s export failed, using PyTorch weights: %s", export_args['format'], e)
+            return False
+    
+    def finish_loading(self):
+        """Complete a deferred load_model after fork: load on the GPU if that was skipped, then warm up"""
+        if self.model is None:
+            self.load_model(defer=False)
+        else:
+            self.warmup()
+    
+    def warmup(self):
+        """Run dummy inferences so the first real frame doesn't pay setup cost
+        
+        Goes through detect_objects_batch at the production batch size so GPU
+        preprocessing, FP16 kernels and cuDNN autotuning for that input shape
+        are all exercised before the first request.
+        """
+        if self.model is None:
+            return
+        frames = [np.zeros((INPUT_SIZE, INPUT_SIZE, 3), dtype=np.uint8)] * self.batch_size
+        for _ in range(WARMUP_RUNS):
+            self.detect_objects_batch(frames)
+    
     def detect_objects(self, frame):
         """Detect objects in a single frame"""
+        return self.detect_objects_batch([frame])[0]
+    
+    def detect_objects_batch(self, frames):
+        """Detect objects in a batch of frames with a single model call"""
+        return self.detect_prepared_batch(self.prepare_batch(frames))
+    
+    def prepare_batch(self, frames):
+        """Start a batch's host->device upload ahead of detect_prepared_batch
+        
+        On CUDA the copy runs asynchronously, so preparing batch N+1 before
+        detecting batch N overlaps the upload with inference. Elsewhere the
+        frames are passed through untouched.
+        """
+        if YOLO_AVAILABLE and self.model is not None and self.device == 'cuda' and TORCH_AVAILABLE:
+            try:
+                return frames, self._stage_upload(frames)
+            except Exception as e:
+                logger.error("Frame upload error, using CPU preprocessing: %s", e)
+        return frames, None
+    
+    def detect_prepared_batch(self, prepared):
+        """Detect objects in a batch returned by prepare_batch"""
+        frames, upload = prepared
         if not YOLO_AVAILABLE or self.model is None:
-            return self.mock_detect_objects(frame)
+            return [self.mock_detect_objects(frame) for frame in frames]
             
         try:
-            results = self.model(frame, conf=self.confidence_threshold, device=self.device, verbose=False)
-            detections = []
-            
-            for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        # Get bounding box coordinates
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        confidence = box.conf[0].cpu().numpy()
-                        class_id = int(box.cls[0].cpu().numpy())
-                        
-                        if class_id in self.coco_classes:
-                            class_name = self.coco_classes[class_id]
-                            detections.append({
-                                'bbox': [float(x1), float(y1), float(x2), float(y2)],
-                                'confidence': float(confidence),
-                                'class_id': class_id,
-                                'class': class_name
-                            })
+            if upload is not None:
+                source, letterbox = self._preprocess_batch(frames, *upload)
+            else:
+                source = frames
+                letterbox = None
             
-            return detections
+            results = self.model(
+                source,
+                conf=self.confidence_threshold,
+                device=self.device,
+                half=self.half,
+                verbose=False
+            )
+            return [self._parse_result(result, letterbox) for result in results]
             
         except Exception as e:
-            logger.error(f"Detection error: {e}")
-            return self.mock_detect_objects(frame)
+            logger.error("Detection error: %s", e)
+            return [self.mock_detect_objects(frame) for frame in frames]
     
-    def mock_detect_objects(self, frame):
-        """Mock object detection for demo purposes"""
-        height, width = frame.shape[:2]
+    def _stage_upload(self, frames):
+        """Copy a batch of same-sized frames to the GPU without blocking
+        
+        Frames are stacked straight into one of two preallocated pinned
+        staging tensors, alternating per batch, and copied on this thread's
+        side stream. Returns the device tensor and the event recorded once
+        the copy is done.
+        """
+        state = self._thread_state
+        shape = (len(frames),) + frames[0].shape
+        staging = getattr(state, 'staging', None)
+        if staging is None or staging[0][0].shape[1:] != shape[1:] or staging[0][0].shape[0] < shape[0]:
+            staging = state.staging = [
+                (torch.empty(shape, dtype=torch.uint8, pin_memory=True), torch.cuda.Event())
+                for _ in range(2)
+            ]
+            state.staging_index = 0
+        host, copied = staging[state.staging_index]
+        state.staging_index ^= 1
+        
+        # The copy out of this buffer two batches ago must finish before it's overwritten
+        copied.synchronize()
+        host = host[:len(frames)]
+        np.stack(frames, out=host.numpy())
+        
+        with torch.cuda.stream(self._upload_stream()):
+            x = host.to(self.device, non_blocking=True)
+            copied.record()
+        return x, copied
+    
+    def _preprocess_batch(self, frames, x, copied):
+        """Preprocess an uploaded batch of BGR frames on the GPU
+        
+        BGR->RGB, letterbox, NCHW transpose and /255 run as a few fused torch
+        ops on the device instead of per-frame NumPy passes on the CPU. x and
+        copied come from _stage_upload.
+        
+        Returns the input tensor and the (gain, left, top, width, height)
+        letterbox that maps its boxes back to frame coordinates.
+        """
+        height, width = frames[0].shape[:2]
+        gain = min(INPUT_SIZE / height, INPUT_SIZE / width)
+        resized_h, resized_w = round(height * gain), round(width * gain)
+        left = (INPUT_SIZE - resized_w) // 2
+        top = (INPUT_SIZE - resized_h) // 2
+        
+        # Order the compute stream after the copy, and keep the side-stream
+        # allocation alive until the compute stream is done with it
+        torch.cuda.current_stream().wait_event(copied)
+        x.record_stream(torch.cuda.current_stream())
+        x = x.permute(0, 3, 1, 2).flip(1)
+        x = x.half() if self.half else x.float()
+        # Keep the aspect ratio, as Ultralytics does, and pad to a square
+        x = torch.nn.functional.interpolate(x, size=(resized_h, resized_w), mode='bilinear', align_corners=False)
+        x = torch.nn.functional.pad(
+            x,
+            (left, INPUT_SIZE - resized_w - left, top, INPUT_SIZE - resized_h - top),
+            value=LETTERBOX_FILL
+        )
+        return x.div_(255.0), (gain, left, top, width, height)
+    
+    def _upload_stream(self):
+        """CUDA stream used for this thread's host->device frame copies"""
+        stream = getattr(self._thread_state, 'upload_stream', None)
+        if stream is None:
+            stream = self._thread_state.upload_stream = torch.cuda.Stream()
+        return stream
+    
+    def _parse_result(self, result, letterbox=None):
+        """Convert a single Ultralytics result into detection dicts
+        
+        letterbox, from _preprocess_batch, maps boxes from a preprocessed
+        input back to frame coordinates.
+        """
         detections = []
         
-        # Generate 3-8 random vehicle detections
-        num_vehicles = random.randint(3, 8)
+        boxes = result.boxes
+        if boxes is None or not len(boxes):
+            return detections
         
-        for i in range(num_vehicles):
-            # Random vehicle type
-            vehicle_type = random.choice(self.vehicle_classes)
-            
-            # Random bounding box
-            x1 = random.randint(0, width // 2)
-            y1 = random.randint(height // 3, height - 100)
-            x2 = x1 + random.randint(80, 150)
-            y2 = y1 + random.randint(60, 100)
-            
-            # Ensure box is within frame
-            x2 = min(x2, width)
-            y2 = min(y2, height)
-            
-            confidence = random.uniform(0.6, 0.95)
-            
+        # One device->host copy per frame; rows are x1, y1, x2, y2, conf, cls
+        data = boxes.data.cpu().numpy()
+        class_ids = data[:, 5].astype(np.int64)
+        keep = np.isin(class_ids, self.coco_class_ids)
+        
+        # Filter and rescale as whole arrays, converting to Python floats once
+        bboxes = data[keep, :4]
+        if letterbox is not None:
+            gain, left, top, width, height = letterbox
+            bboxes = (bboxes - np.array([left, top, left, top], dtype=data.dtype)) / gain
+            bboxes = np.clip(bboxes, 0, np.array([width, height, width, height], dtype=data.dtype))
+        bboxes = bboxes.tolist()
+        confidences = data[keep, 4].tolist()
+        for bbox, confidence, class_id in zip(bboxes, confidences, class_ids[keep].tolist()):
             detections.append({
-                'bbox': [float(x1), float(y1), float(x2), float(y2)],
+                'bbox': bbox,
                 'confidence': confidence,
-                'class_id': 2 if vehicle_type == 'car' else 7,  # car or truck
-                'class': vehicle_type
+                'class_id': class_id,
+                'class': self.coco_classes[class_id]
             })
         
         return detections
     
+    def mock_detect_objects(self, frame):
+        """Mock object detection for demo purposes"""
+        height, width = frame.shape[:2]
+        rng = self._rng()
+        
+        # Generate 3-8 random vehicle detections, drawing each field for all
+        # of them at once
+        num_vehicles = int(rng.integers(3, 9))
+        vehicle_types = rng.choice(self.vehicle_classes, size=num_vehicles).tolist()
+        
+        # Random bounding boxes, kept within the frame
+        x1 = rng.integers(0, width // 2 + 1, size=num_vehicles)
+        y1 = rng.integers(height // 3, height - 100 + 1, size=num_vehicles)
+        x2 = np.minimum(x1 + rng.integers(80, 151, size=num_vehicles), width)
+        y2 = np.minimum(y1 + rng.integers(60, 101, size=num_vehicles), height)
+        bboxes = np.stack((x1, y1, x2, y2), axis=1).astype(float).tolist()
+        
+        confidences = rng.uniform(0.6, 0.95, size=num_vehicles).tolist()
+        
+        return [
+            {
+                'bbox': bbox,
+                'confidence': confidence,
+                'class_id': self.coco_class_id_by_name[vehicle_type],
+                'class': vehicle_type
+            }
+            for bbox, confidence, vehicle_type in zip(bboxes, confidences, vehicle_types)
+        ]
+    
+    def _rng(self):
+        """NumPy generator for mock detections, one per thread since they aren't thread-safe"""
+        rng = getattr(self._thread_state, 'rng', None)
+        if rng is None:
+            rng = self._thread_state.rng = np.random.default_rng()
+        return rng
+    
     def analyze_for_incidents(self, detections, frame_time, frame_shape):
         """Analyze detections for traffic incidents"""
-        incidents = []
-        
-        # Filter vehicles only
-        vehicles = [d for d in detections if d['class'] in self.vehicle_classes]
+        return self.make_incident_analyzer(frame_shape)(detections, frame_time)
+    
+    def make_incident_analyzer(self, frame_shape):
+        """Build analyze(detections, frame_time) specialized to one frame size
         
-        if len(vehicles) == 0:
-            return incidents
+        Frame-size thresholds are computed once, so each frame of a
+        fixed-resolution video only pays for per-detection work.
+        """
+        frame_width = frame_shape[1]
+        frame_area = frame_shape[0] * frame_width
+        jam_area = 0.15 * frame_area  # 15% of frame covered by vehicles
+        blocked_span = 0.7 * frame_width  # Vehicles cover 70% of frame width
         
-        # Traffic jam detection (multiple vehicles with high density)
-        if len(vehicles) >= 4:
-            # Calculate vehicle density
-            frame_area = frame_shape[0] * frame_shape[1]
-            vehicle_area = sum(
-                (d['bbox'][2] - d['bbox'][0]) * (d['bbox'][3] - d['bbox'][1]) 
-                for d in vehicles
-            )
-            density = vehicle_area / frame_area
+        def analyze(detections, frame_time):
+            incidents = []
             
-            if density > 0.15:  # 15% of frame covered by vehicles
-                avg_confidence = sum(v['confidence'] for v in vehicles) / len(vehicles)
-                incidents.append({
-                    'type': 'traffic_jam',
-                    'confidence': min(avg_confidence, 0.9),
-                    'description': f'Heavy traffic detected: {len(vehicles)} vehicles, {density:.1%} coverage',
-                    'timestamp': frame_time,
-                    'bbox': self.get_combined_bbox(vehicles)
-                })
-        
-        # Accident detection (overlapping vehicles or unusual positioning)
-        for i, vehicle1 in enumerate(vehicles):
-            for vehicle2 in vehicles[i+1:]:
-                overlap = self.calculate_overlap(vehicle1['bbox'], vehicle2['bbox'])
-                if overlap > 0.2:  # 20% overlap
-                    confidence = (vehicle1['confidence'] + vehicle2['confidence']) / 2
+            if not detections:
+                return incidents
+            
+            # One structured array per frame; the vehicle filter and the
+            # aggregates below are column operations. vehicle_index maps rows
+            # back to the detection dicts for class names and boxes
+            det = detection_array(detections)
+            vehicle_index = np.flatnonzero(np.isin(det['cls_id'], VEHICLE_CLASS_IDS))
+            if len(vehicle_index) == 0:
+                return incidents
+            det = det[vehicle_index]
+            vehicle_count = len(vehicle_index)
+            areas = (det['x2'] - det['x1']) * (det['y2'] - det['y1'])
+            avg_confidence = float(det['conf'].mean())
+            
+            # Traffic jam detection (multiple vehicles with high density)
+            if vehicle_count >= 4:
+                vehicle_area = float(areas.sum())
+                if vehicle_area > jam_area:
+                    density = vehicle_area / frame_area
+                    incidents.append({
+                        'type': 'traffic_jam',
+                        'confidence': min(avg_confidence, 0.9),
+                        'description': f'Heavy traffic detected: {vehicle_count} vehicles, {density:.1%} coverage',
+                        'timestamp': frame_time,
+                        'bbox': [float(det['x1'].min()), float(det['y1'].min()),
+                                float(det['x2'].max()), float(det['y2'].max())]
+                    })
+            
+            # Accident detection (overlapping vehicles or unusual positioning)
+            if vehicle_count >= 2:
+                boxes = np.stack((det['x1'], det['y1'], det['x2'], det['y2']), axis=1).astype(np.float32)
+                # Only report one accident per vehicle: its first overlapping partner
+                for i, j in zip(*first_overlaps(boxes, COLLISION_IOU_THRESHOLD)):
+                    confidence = float(det['conf'][i] + det['conf'][j]) / 2
+                    pair = det[[i, j]]
+                    first = detections[vehicle_index[i]]['class']
+                    second = detections[vehicle_index[j]]['class']
                     incidents.append({
                         'type': 'car_accident',
                         'confidence': min(confidence * 0.8, 0.85),  # Reduce confidence for accident detection
-                        'description': f'Potential collision: {vehicle1["class"]} and {vehicle2["class"]} overlapping',
+                        'description': f'Potential collision: {first} and {second} overlapping',
                         'timestamp': frame_time,
-                        'bbox': self.get_combined_bbox([vehicle1, vehicle2])
+                        'bbox': [float(pair['x1'].min()), float(pair['y1'].min()),
+                                float(pair['x2'].max()), float(pair['y2'].max())]
                     })
-                    break  # Only report one accident per vehicle
-        
-        # Blocked road detection (vehicles covering most of the width)
-        if len(vehicles) >= 2:
-            # Sort vehicles by x position
-            sorted_vehicles = sorted(vehicles, key=lambda v: v['bbox'][0])
-            leftmost = sorted_vehicles[0]['bbox'][0]
-            rightmost = max(v['bbox'][2] for v in vehicles)
-            road_coverage = (rightmost - leftmost) / frame_shape[1]
             
-            if road_coverage > 0.7:  # Vehicles cover 70% of frame width
-                avg_confidence = sum(v['confidence'] for v in vehicles) / len(vehicles)
-                incidents.append({
-                    'type': 'blocked_road',
-                    'confidence': min(avg_confidence * 0.7, 0.8),
-                    'description': f'Road blockage detected: vehicles spanning {road_coverage:.1%} of road width',
-                    'timestamp': frame_time,
-                    'bbox': [leftmost, min(v['bbox'][1] for v in vehicles), 
-                            rightmost, max(v['bbox'][3] for v in vehicles)]
-                })
-        
-        # Emergency vehicle detection (large vehicles with high confidence)
-        for vehicle in vehicles:
-            if vehicle['class'] in ['truck', 'bus'] and vehicle['confidence'] > 0.85:
-                # Check if it's significantly larger than other vehicles
-                vehicle_area = (vehicle['bbox'][2] - vehicle['bbox'][0]) * (vehicle['bbox'][3] - vehicle['bbox'][1])
-                avg_vehicle_area = sum(
-                    (v['bbox'][2] - v['bbox'][0]) * (v['bbox'][3] - v['bbox'][1]) 
-                    for v in vehicles
-                ) / len(vehicles)
-                
-                if vehicle_area > avg_vehicle_area * 1.5:  # 50% larger than average
+            # Blocked road detection (vehicles covering most of the width)
+            if vehicle_count >= 2:
+                leftmost = float(det['x1'].min())
+                rightmost = float(det['x2'].max())
+                span = rightmost - leftmost
+                if span > blocked_span:
+                    road_coverage = span / frame_width
                     incidents.append({
-                        'type': 'emergency_vehicle',
-                        'confidence': vehicle['confidence'],
-                        'description': f'Large emergency vehicle detected: {vehicle["class"]}',
+                        'type': 'blocked_road',
+                        'confidence': min(avg_confidence * 0.7, 0.8),
+                        'description': f'Road blockage detected: vehicles spanning {road_coverage:.1%} of road width',
                         'timestamp': frame_time,
-                        'bbox': vehicle['bbox']
+                        'bbox': [leftmost, float(det['y1'].min()), 
+                                rightmost, float(det['y2'].max())]
                     })
+            
+            # Emergency vehicle detection (large vehicles with high confidence,
+            # significantly larger than the average vehicle in the frame)
+            large_class = np.isin(det['cls_id'], EMERGENCY_VEHICLE_CLASS_IDS)
+            emergency = large_class & (det['conf'] > 0.85) & (areas > areas.mean() * 1.5)
+            for index in vehicle_index[emergency]:
+                vehicle = detections[index]
+                incidents.append({
+                    'type': 'emergency_vehicle',
+                    'confidence': vehicle['confidence'],
+                    'description': f'Large emergency vehicle detected: {vehicle["class"]}',
+                    'timestamp': frame_time,
+                    'bbox': vehicle['bbox']
+                })
+            
+            return incidents
         
-        return incidents
+        return analyze
     
     def calculate_overlap(self, box1, box2):
         """Calculate intersection over union (IoU) of two bounding boxes"""
@@ -260,70 +699,366 @@ class TrafficYOLOModel:
         
         return [x1, y1, x2, y2]
 
+def open_capture(video_path, hwaccel=None):
+    """Open an OpenCV capture, asking FFmpeg for hardware decoding if hwaccel is set
+    
+    OpenCV builds without hardware acceleration support, or files it can't
+    decode on the GPU, fall back to a plain software capture.
+    """
+    if hwaccel and hasattr(cv2, 'CAP_PROP_HW_ACCELERATION'):
+        acceleration = cv2.VIDEO_ACCELERATION_VAAPI if hwaccel == 'vaapi' else cv2.VIDEO_ACCELERATION_ANY
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_HW_ACCELERATION, acceleration])
+        if cap.isOpened():
+            return cap
+        cap.release()
+    return cv2.VideoCapture(video_path)
+
+class VideoReader:
+    """Sequential video frame reader backed by PyAV when available, else OpenCV"""
+    
+    def __init__(self, video_path, hwaccel=None):
+        self.container = None
+        self.cap = None
+        
+        if AV_AVAILABLE:
+            try:
+                self._open_pyav(video_path, hwaccel)
+            except Exception as e:
+                logger.warning("PyAV could not open video, falling back to OpenCV: %s", e)
+                self.release()
+        
+        if self.container is None:
+            self.cap = open_capture(video_path, hwaccel)
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+            self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 100
+    
+    def _open_pyav(self, video_path, hwaccel):
+        """Open the video with PyAV, using a hardware decoder if requested and supported
+        
+        hwaccel is an FFmpeg device type such as 'cuda' or 'vaapi'; unsupported
+        codecs fall back to software decoding.
+        """
+        options = {}
+        if hwaccel and HWAccel is not None:
+            options['hwaccel'] = HWAccel(device_type=hwaccel, allow_software_fallback=True)
+        
+        self.container = av.open(video_path, **options)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = 'AUTO'
+        self.fps = float(self.stream.average_rate or 30)
+        self.total_frames = self.stream.frames or 100
+    
+    def is_opened(self):
+        return self.container is not None or self.cap.isOpened()
+    
+    def frames(self, frame_skip, max_frames):
+        """Yield (index, frame) for each decoded frame; frame is None when skipped
+        
+        Only sampled frames are converted to BGR arrays.
+        """
+        if self.container is not None:
+            for index, av_frame in enumerate(self.container.decode(self.stream)):
+                if index >= max_frames:
+                    return
+                yield index, av_frame.to_ndarray(format='bgr24') if index % frame_skip == 0 else None
+            return
+        
+        # grab() advances without the BGR conversion and copy that retrieve()
+        # does, so only sampled frames pay for it
+        index = 0
+        while index < max_frames:
+            if not self.cap.grab():
+                return
+            if index % frame_skip == 0:
+                ret, frame = self.cap.retrieve()
+                if not ret:
+                    return
+                yield index, frame
+            else:
+                yield index, None
+            index += 1
+    
+    def release(self):
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+        if self.cap is not None:
+            self.cap.release()
+
+def prefetch(iterable, maxsize):
+    """Iterate over iterable on a background thread, buffering up to maxsize items
+    
+    Lets video decoding run ahead while the caller is busy with inference.
+    Exceptions raised by the producer are re-raised in the caller.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    end = object()
+    
+    def put(item):
+        # Time out periodically so an abandoned consumer doesn't wedge the thread
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((end, None))
+        except Exception as e:
+            put((end, e))
+    
+    producer = threading.Thread(target=produce, name='frame-prefetch', daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
 # Global model instance
 _model_instance = None
+_model_lock = threading.Lock()
 
 def get_model():
-    """Get or create global model instance"""
+    """Get or create global model instance
+    
+    Thread-safe so concurrent first requests under a threaded worker
+    don't load two copies of the model.
+    """
     global _model_instance
     if _model_instance is None:
-        _model_instance = TrafficYOLOModel()
+        with _model_lock:
+            if _model_instance is None:
+                _model_instance = TrafficYOLOModel(
+                    precision=os.environ.get('YOLO_PRECISION', 'fp16'),
+                    calibration_data=os.environ.get('YOLO_CALIBRATION_DATA')
+                )
     return _model_instance
 
-def analyze_video_file(video_path):
+def detect_incidents(model, sampled_frames, fps, batch_size):
+    """Run batched detection and incident analysis over (index, frame) pairs"""
+    incidents = []
+    # Incident analyzers by frame shape; a video has just one
+    analyzers = {}
+    
+    # Sampled frames waiting to be sent to the model as one batch
+    pending_frames = []
+    pending_times = []
+    # The prepared batch whose upload is in flight, detected once the next
+    # batch's upload has been started
+    in_flight = None
+    
+    def detect(batch):
+        frames, frame_times, prepared = batch
+        try:
+            batch_detections = model.detect_prepared_batch(prepared)
+            for frame, frame_time, detections in zip(frames, frame_times, batch_detections):
+                analyze = analyzers.get(frame.shape)
+                if analyze is None:
+                    analyze = analyzers[frame.shape] = model.make_incident_analyzer(frame.shape)
+                incidents.extend(analyze(detections, frame_time))
+        except Exception as e:
+            logger.error("Error processing batch ending at %.1fs: %s", frame_times[-1], e)
+    
+    def flush_batch():
+        nonlocal in_flight
+        frames = list(pending_frames)
+        batch = (frames, list(pending_times), model.prepare_batch(frames))
+        pending_frames.clear()
+        pending_times.clear()
+        # This batch uploads while the previous one runs through the model
+        if in_flight is not None:
+            detect(in_flight)
+        in_flight = batch
+    
+    for index, frame in sampled_frames:
+        pending_frames.append(frame)
+        pending_times.append(index / fps)
+        if len(pending_frames) >= batch_size:
+            flush_batch()
+    
+    if pending_frames:
+        flush_batch()
+    if in_flight is not None:
+        detect(in_flight)
+    
+    return incidents
+
+def _init_shard_worker(workers):
+    """Split CPU threads between shard workers and load the model once per process
+    
+    workers counts the shard processes on the host: each gunicorn worker's
+    pool times SERVER_WORKERS.
+    """
+    if TORCH_AVAILABLE:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    model = get_model()
+    # Spawned from a gunicorn worker, the deferred-warmup setting is inherited
+    if os.environ.get('DEFER_MODEL_WARMUP') == '1':
+        model.finish_loading()
+
+def _analyze_shard(video_path, start, end, frame_skip, fps, batch_size):
+    """Analyze frames [start, end) of a video in a shard worker process
+    
+    Returns the shard's incidents and the number of frames it decoded.
+    """
+    cap = open_capture(video_path, 'vaapi' if os.path.exists(VAAPI_RENDER_NODE) else None)
+    decoded_frames = [0]
+    
+    def shard_frames():
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for index in range(start, end):
+            if not cap.grab():
+                return
+            decoded_frames[0] += 1
+            if index % frame_skip == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    return
+                yield index, frame
+    
+    try:
+        incidents = detect_incidents(get_model(), shard_frames(), fps, batch_size)
+    finally:
+        cap.release()
+    return incidents, decoded_frames[0]
+
+_shard_pool = None
+_shard_pool_lock = threading.Lock()
+
+def get_shard_pool():
+    """Get or create the process pool used to analyze video time shards
+    
+    Workers are spawned rather than forked so they don't inherit the
+    parent's torch thread pools, and they are kept between requests so
+    each loads its model only once.
+    """
+    global _shard_pool
+    if _shard_pool is None:
+        with _shard_pool_lock:
+            if _shard_pool is None:
+                _shard_pool = ProcessPoolExecutor(
+                    max_workers=VIDEO_SHARD_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_shard_worker,
+                    initargs=(SERVER_WORKERS * VIDEO_SHARD_WORKERS,)
+                )
+    return _shard_pool
+
+def discard_shard_pool(pool):
+    """Shut down a broken shard pool so the next request spawns a fresh one"""
+    global _shard_pool
+    with _shard_pool_lock:
+        if _shard_pool is pool:
+            _shard_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def analyze_video_shards(video_path, frame_count, frame_skip, fps, batch_size):
+    """Analyze a video as VIDEO_SHARD_WORKERS time ranges in parallel processes
+    
+    Raises BrokenProcessPool, after discarding the pool, if a worker died.
+    """
+    bounds = np.linspace(0, frame_count, VIDEO_SHARD_WORKERS + 1, dtype=int).tolist()
+    pool = get_shard_pool()
+    try:
+        futures = [
+            pool.submit(_analyze_shard, video_path, start, end, frame_skip, fps, batch_size)
+            for start, end in zip(bounds, bounds[1:])
+            if end > start
+        ]
+        
+        incidents = []
+        processed_frames = 0
+        for future in futures:
+            shard_incidents, shard_frames = future.result()
+            incidents.extend(shard_incidents)
+            processed_frames += shard_frames
+    except BrokenProcessPool:
+        discard_shard_pool(pool)
+        raise
+    return incidents, processed_frames
+
+def analyze_video_in_process(model, video, frame_skip, frame_count, fps, batch_size):
+    """Analyze a video in this process, returning its incidents and decoded frame count"""
+    decoded_frames = [0]
+    
+    def sampled_frames():
+        for index, frame in video.frames(frame_skip, frame_count):
+            decoded_frames[0] = index + 1
+            if frame is not None:
+                yield index, frame
+    
+    # Decode on a background thread so the next batch is ready while the
+    # model is busy with the current one
+    incidents = detect_incidents(model, prefetch(sampled_frames(), maxsize=2 * batch_size), fps, batch_size)
+    return incidents, decoded_frames[0]
+
+def analyze_video_file(video_path, batch_size=None):
     """Analyze video file for traffic incidents"""
     model = get_model()
+    batch_size = batch_size or model.batch_size
     
     # Try to open video file
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        logger.error(f"Could not open video file: {video_path}")
+    # Decode on NVDEC next to CUDA inference; otherwise offload decode to a
+    # VAAPI-capable GPU when present so CPU cores stay free for inference
+    if model.device == 'cuda':
+        hwaccel = 'cuda'
+    elif os.path.exists(VAAPI_RENDER_NODE):
+        hwaccel = 'vaapi'
+    else:
+        hwaccel = None
+    video = VideoReader(video_path, hwaccel=hwaccel)
+    if not video.is_opened():
+        logger.error("Could not open video file: %s", video_path)
         # Return mock results if video can't be opened
         return generate_mock_analysis()
     
     try:
-        fps = cap.get(cv2.CAP_PROP_FPS) or 30
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 100
-        
-        incidents = []
-        processed_frames = 0
+        fps = video.fps
+        total_frames = video.total_frames
         
         # Process every 10th frame for efficiency (3 FPS analysis)
         frame_skip = max(1, int(fps / 3))
         
-        logger.info(f"Analyzing video: {total_frames} frames at {fps} FPS, processing every {frame_skip} frames")
+        # Limit processing for demo (max 300 frames or 10 seconds)
+        frame_count = min(MAX_ANALYZED_FRAMES, total_frames)
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            if processed_frames % frame_skip == 0:
-                frame_time = processed_frames / fps
-                
-                try:
-                    # Detect objects
-                    detections = model.detect_objects(frame)
-                    
-                    # Analyze for incidents
-                    frame_incidents = model.analyze_for_incidents(detections, frame_time, frame.shape)
-                    incidents.extend(frame_incidents)
-                    
-                except Exception as e:
-                    logger.error(f"Error processing frame {processed_frames}: {e}")
-            
-            processed_frames += 1
-            
-            # Limit processing for demo (max 300 frames or 10 seconds)
-            if processed_frames >= min(300, total_frames):
-                break
+        logger.info("Analyzing video: %s frames at %s FPS, processing every %s frames", total_frames, fps, frame_skip)
         
-        cap.release()
+        # A GPU is kept busy by batching alone; on CPU hosts split the video
+        # into time shards analyzed by separate processes to use every core
+        if model.device == 'cpu' and YOLO_AVAILABLE and VIDEO_SHARD_WORKERS > 1:
+            video.release()
+            try:
+                incidents, processed_frames = analyze_video_shards(video_path, frame_count, frame_skip, fps, batch_size)
+            except BrokenProcessPool:
+                # A worker was killed (e.g. OOM); the pool is respawned next
+                # request, so analyze this video here rather than fail it
+                logger.error("Shard worker died, analyzing %s in-process", video_path)
+                video = VideoReader(video_path, hwaccel=hwaccel)
+                incidents, processed_frames = analyze_video_in_process(model, video, frame_skip, frame_count, fps, batch_size)
+                video.release()
+        else:
+            incidents, processed_frames = analyze_video_in_process(model, video, frame_skip, frame_count, fps, batch_size)
+            video.release()
         
         # Remove duplicate incidents (same type within 2 seconds)
         incidents = remove_duplicate_incidents(incidents)
         
-        logger.info(f"Analysis complete: {len(incidents)} incidents detected in {processed_frames} frames")
+        logger.info("Analysis complete: %s incidents detected in %s frames", len(incidents), processed_frames)
         
         return {
             'incidents': incidents,
@@ -333,8 +1068,8 @@ def analyze_video_file(video_path):
         }
         
     except Exception as e:
-        logger.error(f"Video analysis failed: {e}")
-        cap.release()
+        logger.error("Video analysis failed: %s", e)
+        video.release()
         return generate_mock_analysis()
 
 def remove_duplicate_incidents(incidents):
@@ -346,17 +1081,14 @@ def remove_duplicate_incidents(incidents):
     incidents.sort(key=lambda x: x['timestamp'])
     
     filtered = []
+    # Timestamps are sorted, so the most recently kept incident of a type is
+    # the only one that can be within 2 seconds of the next
+    last_kept = {}
     for incident in incidents:
-        # Check if we already have a similar incident recently
-        is_duplicate = False
-        for existing in filtered:
-            if (existing['type'] == incident['type'] and 
-                abs(existing['timestamp'] - incident['timestamp']) < 2.0):
-                is_duplicate = True
-                break
-        
-        if not is_duplicate:
+        previous = last_kept.get(incident['type'])
+        if previous is None or incident['timestamp'] - previous >= 2.0:
             filtered.append(incident)
+            last_kept[incident['type']] = incident['timestamp']
     
     return filtered
 